@@ -0,0 +1,5 @@
+# agent_core
+# ----------
+# Helpers shared by the agent loops in amazon_mcp_tools/, gmail_tools_server/ and neo4j/.
+# Those projects run as scripts from their own folder, so their entry points put the
+# repo root on sys.path before importing their agents.
@@ -0,0 +1,196 @@
+# cassette.py
+# -----------
+# Record/replay of everything an agent pipeline gets from the outside world, so it can be
+# re-run offline: no API keys, no MCP servers, no network.
+#
+#   AGENT_CASSETTE=run.jsonl AGENT_CASSETTE_MODE=record  python client.py   # real run, saved
+#   AGENT_CASSETTE=run.jsonl AGENT_CASSETTE_MODE=replay  python client.py   # served back
+#
+# The cassette is JSONL, one record per line:
+#   {"kind": "llm",   "key": ..., "model": ..., "request": {...}, "response": {...}, "seconds": ...}
+#   {"kind": "tool",  "key": ..., "name": ..., "args": {...}, "result": "...", "seconds": ...}
+#   {"kind": "value", "name": "tool_defs", "value": ...}     # setup the client did (tool list, schema prompt)
+#
+# Replay matches a request by key (a hash of the request, see llm_cache.cache_key), taking
+# same-key records in recorded order. If the request changed (a prompt edit, a timestamp) it
+# falls back to the next unused record of the same model / tool, unless AGENT_CASSETTE_STRICT=1,
+# where any mismatch raises CassetteMiss - use that in CI to catch prompt regressions.
+#
+# Replay answers instantly, so what's left is our own orchestration time (prompt building,
+# JSON parsing, tool dispatch). AGENT_CASSETTE_REALTIME=1 sleeps for the recorded latencies instead.
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict, deque
+
+from agent_core.llm_cache import cache_key
+
+CASSETTE_PATH = os.getenv("AGENT_CASSETTE", "")
+CASSETTE_MODE = os.getenv("AGENT_CASSETTE_MODE", "replay" if CASSETTE_PATH else "")
+CASSETTE_STRICT = os.getenv("AGENT_CASSETTE_STRICT", "0").lower() in ("1", "true", "yes", "on")
+CASSETTE_REALTIME = os.getenv("AGENT_CASSETTE_REALTIME", "0").lower() in ("1", "true", "yes", "on")
+
+FORMAT_VERSION = 1
+
+
+class CassetteMiss(Exception):
+    """Replay was asked for something the cassette doesn't have."""
+
+
+def tool_key(name: str, args: dict) -> str:
+    blob = json.dumps({"name": name, "args": args}, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ReplayTool:
+    """Stands in for an MCP tool during replay; call_tool() answers from the cassette before reaching it."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def coroutine(self, **kwargs):
+        raise CassetteMiss(f"tool {self.name} was called outside call_tool() during replay")
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str, strict: bool = False, realtime: bool = False):
+        if mode not in ("", "record", "replay"):
+            raise ValueError(f"AGENT_CASSETTE_MODE must be record or replay, not {mode!r}")
+        if mode and not path:
+            raise ValueError("AGENT_CASSETTE_MODE is set but AGENT_CASSETTE (the cassette path) is not")
+
+        self.path = path
+        self.mode = mode
+        self.strict = strict
+        self.realtime = realtime
+        self.recorded = 0
+        self.replayed = 0
+        self.fallbacks = 0      # replayed by position because the request no longer matched exactly
+        self._file = None
+        self._by_key = defaultdict(deque)      # (kind, key) -> records
+        self._by_source = defaultdict(deque)   # (kind, model or tool name) -> records
+        self._values = {}
+
+        if mode == "replay":
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    # ---------- recording ----------
+
+    def _write(self, record: dict) -> None:
+        if self._file is None:
+            # A recording starts a fresh cassette
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._file.write(json.dumps({"kind": "meta", "version": FORMAT_VERSION, "recorded_at": time.time()}) + "\n")
+        self._file.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.recorded += 1
+
+    def record_llm(self, kwargs: dict, response: dict) -> None:
+        """`response` is an llm_cache.to_record() dict, which carries the call's latency."""
+        request = {k: v for k, v in kwargs.items() if k not in ("stream", "stream_options")}
+        self._write({"kind": "llm", "key": cache_key(kwargs), "model": kwargs.get("model"),
+                     "request": request, "response": response, "seconds": round(response["seconds"], 4)})
+
+    def record_tool(self, name: str, args: dict, result: str, seconds: float) -> None:
+        self._write({"kind": "tool", "key": tool_key(name, args), "name": name,
+                     "args": args, "result": result, "seconds": round(seconds, 4)})
+
+    def record_value(self, name: str, value) -> None:
+        self._write({"kind": "value", "name": name, "value": value})
+
+    # ---------- replay ----------
+
+    def _load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                kind = record["kind"]
+                if kind == "meta":
+                    if record.get("version") != FORMAT_VERSION:
+                        raise ValueError(f"{self.path} is cassette format {record.get('version')}, expected {FORMAT_VERSION}")
+                elif kind == "value":
+                    self._values[record["name"]] = record["value"]
+                else:
+                    source = record["model"] if kind == "llm" else record["name"]
+                    self._by_key[(kind, record["key"])].append(record)
+                    self._by_source[(kind, source)].append(record)
+
+    def _take(self, kind: str, key: str, source: str) -> dict:
+        exact = self._by_key.get((kind, key))
+        while exact:
+            record = exact.popleft()
+            if not record.get("_used"):
+                break
+        else:
+            record = None
+            if self.strict:
+                raise CassetteMiss(f"no recorded {kind} call for {source} matches this request (strict replay)")
+            pending = self._by_source.get((kind, source))
+            while pending:
+                candidate = pending.popleft()
+                if not candidate.get("_used"):
+                    record = candidate
+                    self.fallbacks += 1
+                    break
+            if record is None:
+                raise CassetteMiss(f"the cassette has no more {kind} calls for {source}")
+
+        record["_used"] = True
+        self.replayed += 1
+        return record
+
+    async def _pace(self, record: dict) -> None:
+        if self.realtime and record.get("seconds"):
+            await asyncio.sleep(record["seconds"])
+
+    async def replay_llm(self, kwargs: dict) -> dict:
+        """The recorded response record (see llm_cache.to_record) for this chat request."""
+        record = self._take("llm", cache_key(kwargs), kwargs.get("model"))
+        await self._pace(record)
+        return record["response"]
+
+    async def replay_tool(self, name: str, args: dict) -> str:
+        record = self._take("tool", tool_key(name, args), name)
+        await self._pace(record)
+        return record["result"]
+
+    def value(self, name: str):
+        if name not in self._values:
+            raise CassetteMiss(f"the cassette has no recorded {name!r}")
+        return self._values[name]
+
+    def replay_tool_mapping(self, tool_defs: list) -> dict:
+        return {d["function"]["name"]: ReplayTool(d["function"]["name"]) for d in tool_defs}
+
+    # ---------- both ----------
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode or None,
+            "path": self.path or None,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "fallbacks": self.fallbacks,
+            "unused": sum(1 for records in self._by_source.values() for r in records if not r.get("_used")),
+        }
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+CASSETTE = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_STRICT, CASSETTE_REALTIME)
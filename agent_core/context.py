@@ -0,0 +1,111 @@
+# context.py
+# ----------
+# Keeps an agent's conversation under a token budget.
+#
+# AgentLoop.run() resends the whole history every turn, and tool results are the bulk
+# of it: full product pages, full email bodies. Once the estimated prompt passes the
+# budget, the oldest tool results are compacted in place, oldest first, until it fits:
+#
+#   JSON results   every key is kept; long prose strings (descriptions, body_text, snippets)
+#                  are cut to AGENT_CONTEXT_FIELD_CHARS
+#   text/Markdown  headings and "Field: value" lines are kept; long prose lines are cut the same way
+#
+# Numbers, ids and URLs (strings without whitespace) are never cut, so the model still has
+# the prices, ratings, message ids and links it compares on. Results from the latest turn,
+# which the model hasn't read yet, are left alone.
+#
+#   AGENT_CONTEXT_BUDGET=8000        estimated prompt tokens before compacting (0 turns it off)
+#   AGENT_CONTEXT_FIELD_CHARS=200    what's left of a long string or line once compacted
+
+import json
+import os
+
+CONTEXT_BUDGET = int(os.getenv("AGENT_CONTEXT_BUDGET", "8000"))
+CONTEXT_FIELD_CHARS = int(os.getenv("AGENT_CONTEXT_FIELD_CHARS", "200"))
+
+
+def estimate_tokens(text: str) -> int:
+    """About 4 characters per token: good enough to budget with, and free."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def message_tokens(messages: list) -> int:
+    return estimate_tokens(json.dumps(messages, default=str, ensure_ascii=False))
+
+
+def _shorten(text: str, limit: int) -> str:
+    # No whitespace: an id, a URL, a number - cutting it would only make it wrong
+    if len(text) <= limit or not any(c.isspace() for c in text):
+        return text
+    return f"{text[:limit].rstrip()}… [+{len(text) - limit} chars]"
+
+
+def _compact_value(value, limit: int):
+    if isinstance(value, str):
+        return _shorten(value, limit)
+    if isinstance(value, dict):
+        return {k: _compact_value(v, limit) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_compact_value(v, limit) for v in value]
+    return value
+
+
+def _compact_line(line: str, limit: int) -> str:
+    _, sep, value = line.partition(": ")
+    if sep and not any(c.isspace() for c in value.strip()):
+        return line     # "URL: https://...", "Price: $499.99"
+    return _shorten(line, limit)
+
+
+def compact_tool_result(content: str, limit: int = CONTEXT_FIELD_CHARS) -> str:
+    """A shorter version of one tool result that keeps its structure and its short fields."""
+    try:
+        data = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        data = None
+    if isinstance(data, (dict, list)):
+        return json.dumps(_compact_value(data, limit), ensure_ascii=False)
+
+    lines = [_compact_line(line, limit) for line in content.splitlines() if line.strip()]
+    return "\n".join(lines)
+
+
+class ContextBudget:
+    def __init__(self, budget: int = CONTEXT_BUDGET, field_chars: int = CONTEXT_FIELD_CHARS):
+        self.budget = budget
+        self.field_chars = field_chars
+        self.compacted = 0          # tool results compacted so far
+        self.saved_tokens = 0
+
+    def fit(self, messages: list, keep_from: int) -> int:
+        """
+        Compact tool results in messages[:keep_from], oldest first, until the estimate is under budget.
+        Edits `messages` in place; returns the tokens saved.
+        """
+        if self.budget <= 0:
+            return 0
+
+        total = message_tokens(messages)
+        saved = 0
+        for message in messages[:keep_from]:
+            if total <= self.budget:
+                break
+            if message.get("role") != "tool" or not isinstance(message.get("content"), str):
+                continue
+
+            before = estimate_tokens(message["content"])
+            compacted = compact_tool_result(message["content"], self.field_chars)
+            after = estimate_tokens(compacted)
+            if after >= before:
+                continue      # already compact (or compacted on an earlier turn)
+
+            message["content"] = compacted
+            total -= before - after
+            saved += before - after
+            self.compacted += 1
+
+        self.saved_tokens += saved
+        return saved
+
+    def stats(self) -> dict:
+        return {"budget": self.budget, "compacted_results": self.compacted, "saved_tokens": self.saved_tokens}
@@ -0,0 +1,318 @@
+# engine.py
+# ---------
+# The one agent loop every tool-using agent in this repo runs on.
+#
+#   agent = AgentLoop(model, tool_mapping, tool_defs, max_turns=3)
+#   final_text = await agent.run(messages, temperature=1.0)
+#
+# Each turn: ask the model, keep its `tool_calls` on the assistant message, run the calls
+# concurrently (agent_core.tools), append one `role: "tool"` message per call in
+# tool_call_id order, repeat until the model answers without tools or max_turns is hit.
+#
+# Models without native tool calling (Ollama) use the two-phase flow instead:
+#
+#   executed_results = await agent.plan_tools(planning_messages, temperature=0.3)
+#   final_text = await agent.complete_text(final_messages, temperature=0.6)
+#
+# Provider quirks live in the adapters below (picked from the "provider:" model prefix),
+# not in the agents. Every turn is timed and its token usage recorded in `agent.turns`.
+#
+# Progress callbacks (sync or async), for streaming to a UI:
+#   on_token(text)          - answer text as it streams in
+#   on_event(kind, data)    - "tool_call" {id, name, arguments}, "tool_result" {id, name, seconds, chars, error},
+#                             "turn" {TurnStats fields} once a turn (LLM call + its tools) is done
+#
+# With AGENT_TRACE set, each turn is also a "turn" span (tracing.py) holding its LLM and tool spans.
+#
+# run() keeps the history under AGENT_CONTEXT_BUDGET estimated tokens by compacting older tool
+# results (context.py); the tokens that saved are in each turn's `compacted_tokens`.
+
+import json
+import time
+from dataclasses import asdict, dataclass
+
+from agent_core.context import CONTEXT_BUDGET, ContextBudget, estimate_tokens, message_tokens
+from agent_core.llm import chat, chat_stream, emit
+from agent_core.tools import run_tools
+from agent_core.tracing import span
+
+
+class ProviderAdapter:
+    """OpenAI-style chat completions with native tool calling."""
+
+    name = "openai"
+    native_tools = True
+    tool_name_in_results = True     # OpenAI accepts (and our logs like) `tool_name` on tool messages
+    streaming = True                # aisuite passes stream=True through to the SDK
+    stream_kwargs = {"stream_options": {"include_usage": True}}
+
+    def assistant_message(self, msg) -> dict:
+        """The assistant turn as we send it back next time; tool_calls must stay so the tool messages make sense."""
+        assistant_msg = {"role": msg.role, "content": msg.content or ""}
+        if getattr(msg, "tool_calls", None):
+            assistant_msg["tool_calls"] = [
+                {
+                    "id": tc.id,
+                    "type": tc.type,
+                    "function": {"name": tc.function.name, "arguments": tc.function.arguments},
+                }
+                for tc in msg.tool_calls
+            ]
+        return assistant_msg
+
+    def tool_message(self, tool_call, content: str) -> dict:
+        message = {"role": "tool", "tool_call_id": tool_call.id, "content": content}
+        if self.tool_name_in_results:
+            message["tool_name"] = tool_call.function.name
+        return message
+
+
+class OpenAIAdapter(ProviderAdapter):
+    pass
+
+
+class GroqAdapter(ProviderAdapter):
+    name = "groq"
+    tool_name_in_results = False    # Groq rejects tool messages with a `tool_name` field
+    streaming = False               # aisuite's Groq provider doesn't normalize stream chunks
+    stream_kwargs = {}
+
+
+class AnthropicAdapter(ProviderAdapter):
+    name = "anthropic"
+    tool_name_in_results = False    # aisuite turns tool messages into tool_result blocks by id
+    streaming = False
+    stream_kwargs = {}
+
+
+class OllamaAdapter(ProviderAdapter):
+    name = "ollama"
+    native_tools = False            # /api/chat has no OpenAI-style tools; use plan_tools()
+    tool_name_in_results = False
+    streaming = False
+    stream_kwargs = {}
+
+
+ADAPTERS = {
+    "openai": OpenAIAdapter(),
+    "groq": GroqAdapter(),
+    "anthropic": AnthropicAdapter(),
+    "ollama": OllamaAdapter(),
+}
+
+
+def adapter_for(model: str) -> ProviderAdapter:
+    """Adapter for an aisuite model string like "groq:llama-3.1-8b-instant"; unknown providers are treated as OpenAI-compatible."""
+    return ADAPTERS.get(model.split(":", 1)[0], ADAPTERS["openai"])
+
+
+@dataclass
+class TurnStats:
+    turn: int
+    llm_seconds: float = 0.0
+    tool_seconds: float = 0.0
+    tool_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tokens_estimated: bool = False  # provider reported no usage; counted as ~4 characters per token
+    cached: bool = False            # answered from the LLM response cache
+    compacted_tokens: int = 0       # estimated tokens cut from older tool results before this turn's call
+
+    def line(self) -> str:
+        approx = "~" if self.tokens_estimated else ""
+        llm = "cached" if self.cached else f"{self.llm_seconds:.2f}s"
+        compacted = f" (compacted ~{self.compacted_tokens})" if self.compacted_tokens else ""
+        return (f"[turn {self.turn}] llm {llm}, {self.tool_calls} tool calls {self.tool_seconds:.2f}s, "
+                f"tokens {approx}{self.prompt_tokens} in{compacted} / {approx}{self.completion_tokens} out")
+
+
+class AgentLoop:
+    def __init__(self, model: str, tool_mapping: dict | None = None, tool_defs: list | None = None,
+                 max_turns: int = 3, on_token=None, on_event=None, cache: bool = True, verbose: bool = True,
+                 context_budget: int | None = None, serial_tools=frozenset()):
+        self.model = model
+        self.adapter = adapter_for(model)
+        self.tool_mapping = tool_mapping or {}
+        self.tool_defs = tool_defs
+        self.max_turns = max_turns
+        self.on_token = on_token
+        self.on_event = on_event
+        self.cache = cache              # False: never answer this agent from the LLM response cache
+        self.serial_tools = serial_tools    # tools that write: run in order, never alongside other calls
+        self.verbose = verbose
+        # Estimated prompt tokens run() keeps the history under; 0 never compacts
+        self.context = ContextBudget(CONTEXT_BUDGET if context_budget is None else context_budget)
+        self._streamed_text = False   # on_token got text since the last stats line
+        self.turns: list[TurnStats] = []
+
+    async def _event(self, kind: str, data: dict) -> None:
+        if self.on_event is not None:
+            await emit(self.on_event, kind, data)
+
+    async def _turn_done(self, stats: TurnStats, turn_span) -> None:
+        turn_span.set(**asdict(stats))
+        if self.verbose:
+            # Start the stats line on a fresh line when answer text was just printed by a console on_token
+            print(("\n" if self._streamed_text else "") + stats.line())
+        self._streamed_text = False
+        await self._event("turn", asdict(stats))
+
+    async def _run_calls(self, stats: TurnStats, calls: list) -> list:
+        """Run [(id, name, arguments), ...] concurrently (serial_tools in order), reporting each one's progress; results in call order."""
+        for call_id, name, arguments in calls:
+            await self._event("tool_call", {"id": call_id, "name": name, "arguments": arguments})
+
+        async def done(index: int, result: str, seconds: float) -> None:
+            call_id, name, _ = calls[index]
+            await self._event("tool_result", {"id": call_id, "name": name, "seconds": round(seconds, 3),
+                                              "chars": len(result), "error": result.startswith("ERROR")})
+
+        start = time.perf_counter()
+        results = await run_tools([(name, arguments) for _, name, arguments in calls], self.tool_mapping, on_done=done,
+                                  serial=self.serial_tools)
+        stats.tool_seconds = time.perf_counter() - start
+        stats.tool_calls = len(calls)
+        return results
+
+    async def complete(self, messages: list, temperature: float, tools: list | None = None, stream: bool = True):
+        """One timed LLM call; returns the assistant message (content + tool_calls). `stream=False` keeps its text away from on_token."""
+        stats = TurnStats(turn=len(self.turns) + 1)
+        self.turns.append(stats)
+
+        kwargs = {"model": self.model, "messages": messages, "temperature": temperature, "cache": self.cache}
+        if tools:
+            kwargs["tools"] = tools
+
+        on_token = self.on_token if stream else None
+
+        start = time.perf_counter()
+        if on_token is not None and self.adapter.streaming:
+            msg, usage = await chat_stream(on_token, **kwargs, **self.adapter.stream_kwargs)
+            stats.cached = getattr(msg, "cached", False)
+            self._streamed_text = bool(msg.content)
+        else:
+            response = await chat(**kwargs)
+            msg, usage = response.choices[0].message, getattr(response, "usage", None)
+            stats.cached = getattr(response, "cached", False)
+            if on_token is not None and msg.content:
+                # Provider can't stream: hand over the whole answer as one chunk
+                await emit(on_token, msg.content)
+                self._streamed_text = True
+        stats.llm_seconds = time.perf_counter() - start
+
+        if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+            stats.prompt_tokens = usage.prompt_tokens
+            stats.completion_tokens = usage.completion_tokens or 0
+        else:
+            stats.tokens_estimated = True
+            stats.prompt_tokens = message_tokens(messages)
+            stats.completion_tokens = estimate_tokens((msg.content or "") + "".join(
+                tc.function.arguments or "" for tc in (getattr(msg, "tool_calls", None) or [])))
+
+        return msg
+
+    def _turn_span(self, kind: str):
+        return span(f"turn {len(self.turns) + 1}", "turn", model=self.model, kind=kind)
+
+    async def complete_text(self, messages: list, temperature: float) -> str:
+        with self._turn_span("answer") as s:
+            msg = await self.complete(messages, temperature)
+            await self._turn_done(self.turns[-1], s)
+        return msg.content or ""
+
+    async def run(self, messages: list, temperature: float = 1.0) -> str:
+        """The tool-calling loop. `messages` is extended in place with the whole conversation."""
+        if not self.adapter.native_tools:
+            raise ValueError(f"{self.model} has no native tool calling; use plan_tools() + complete_text()")
+
+        final_text = ""
+        unread_from = len(messages)     # tool results from here on haven't been answered yet
+
+        for i in range(self.max_turns):
+            if self.verbose:
+                print(f"Attempt : {i+1}")
+
+            with self._turn_span("tools") as s:
+                compacted = self.context.fit(messages, keep_from=unread_from)
+                msg = await self.complete(messages, temperature, tools=self.tool_defs)
+                self.turns[-1].compacted_tokens = compacted
+                unread_from = len(messages)
+                messages.append(self.adapter.assistant_message(msg))
+
+                # No tool calls: this is the final answer
+                if not getattr(msg, "tool_calls", None):
+                    final_text = msg.content or ""
+                    await self._turn_done(self.turns[-1], s)
+                    if self.verbose and self.on_token is None:   # otherwise the caller has already shown it
+                        print("✅ Final answer:")
+                        print(final_text)
+                    break
+
+                stats = self.turns[-1]
+                tool_responses = await self._run_calls(
+                    stats, [(tc.id, tc.function.name, tc.function.arguments) for tc in msg.tool_calls])
+
+                for tool_call, tool_response in zip(msg.tool_calls, tool_responses):
+                    messages.append(self.adapter.tool_message(tool_call, tool_response))
+
+                await self._turn_done(stats, s)
+
+        return final_text
+
+    async def plan_tools(self, messages: list, temperature: float = 0.3) -> list:
+        """
+        Two-phase tool use for models without native tool calling: the model answers `messages` with a
+        JSON array of {"tool_name", "args", "purpose"}; the valid entries run concurrently.
+        Returns [{"tool_name", "args", "purpose", "result"}, ...] in the proposed order.
+        """
+        with self._turn_span("plan") as s:
+            return await self._plan_tools(messages, temperature, s)
+
+    async def _plan_tools(self, messages: list, temperature: float, s) -> list:
+        # The JSON plan is not answer text: keep it out of on_token
+        msg = await self.complete(messages, temperature, stream=False)
+        plan_text = msg.content or "[]"
+
+        try:
+            proposed_calls = json.loads(plan_text)
+            if not isinstance(proposed_calls, list):
+                proposed_calls = []
+        except json.JSONDecodeError:
+            # The model ignored instructions and didn't give valid JSON: no tool calls
+            proposed_calls = []
+
+        valid_calls = [
+            call for call in proposed_calls
+            if isinstance(call, dict)
+            and call.get("tool_name") in self.tool_mapping
+            and isinstance(call.get("args", {}) or {}, dict)   # args must be a dict
+        ]
+
+        stats = self.turns[-1]
+        results = await self._run_calls(
+            stats, [(f"plan-{i}", call["tool_name"], call.get("args", {}) or {}) for i, call in enumerate(valid_calls)])
+        await self._turn_done(stats, s)
+
+        return [
+            {
+                "tool_name": call["tool_name"],
+                "args": call.get("args", {}) or {},
+                "purpose": call.get("purpose", ""),
+                "result": result,
+            }
+            for call, result in zip(valid_calls, results)
+        ]
+
+    def totals(self) -> dict:
+        return {
+            "turns": len(self.turns),
+            "llm_seconds": round(sum(t.llm_seconds for t in self.turns), 3),
+            "tool_seconds": round(sum(t.tool_seconds for t in self.turns), 3),
+            "tool_calls": sum(t.tool_calls for t in self.turns),
+            "prompt_tokens": sum(t.prompt_tokens for t in self.turns),
+            "completion_tokens": sum(t.completion_tokens for t in self.turns),
+            "tokens_estimated": any(t.tokens_estimated for t in self.turns),
+            "cached_turns": sum(t.cached for t in self.turns),
+            "compacted_tokens": sum(t.compacted_tokens for t in self.turns),
+        }
+
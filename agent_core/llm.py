@@ -0,0 +1,206 @@
+# llm.py
+# ------
+# Async front end for aisuite.
+#
+# aisuite only has a blocking `client.chat.completions.create`. Called straight from an
+# `async def` agent it freezes the event loop for the whole LLM round trip, so nothing else
+# (other tool calls, other FastAPI requests) can make progress. `chat()` runs that call on a
+# dedicated thread pool instead and awaits the result:
+#
+#   response = await chat(model="openai:gpt-4o-mini", messages=messages, tools=tool_defs)
+#   message, usage = await chat_stream(on_token, model=..., messages=...)   # same, streamed
+#
+# AGENT_LLM_THREADS caps how many LLM requests can be in flight at once across all agents.
+# Both go through the response cache in llm_cache.py when AGENT_LLM_CACHE is on; pass
+# `cache=False` to always ask the provider. With AGENT_CASSETTE set they are recorded to,
+# or replayed from, a cassette (cassette.py). Each call is one "llm" span (tracing.py).
+
+import asyncio
+import inspect
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import aisuite as ai
+
+from agent_core.cassette import CASSETTE
+from agent_core.llm_cache import LLM_CACHE, as_response, cache_key, from_record, to_record
+from agent_core.tracing import TRACING, span
+
+LLM_THREADS = int(os.getenv("AGENT_LLM_THREADS", "16"))
+
+# One aisuite client (and so one HTTP connection pool per provider) shared by every agent
+CLIENT = ai.Client()
+
+_executor = ThreadPoolExecutor(max_workers=LLM_THREADS, thread_name_prefix="llm")
+
+
+def _cache_lookup(cache: bool, kwargs: dict) -> tuple:
+    """(key, record): key is None when this call doesn't use the cache, record None on a miss."""
+    if not LLM_CACHE.enabled:
+        return None, None
+    if not cache:
+        LLM_CACHE.bypassed += 1
+        return None, None
+    key = cache_key(kwargs)
+    return key, LLM_CACHE.get(key)
+
+
+def _trace_response(s, record: dict, source: str) -> None:
+    """Put what came back on the LLM call's span."""
+    if not TRACING:
+        return
+    msg = record["message"]
+    payload = (msg["content"] or "") + "".join(tc["function"]["arguments"] or "" for tc in msg["tool_calls"] or [])
+    s.set(source=source, response_bytes=len(payload.encode("utf-8")), tool_calls=len(msg["tool_calls"] or []))
+    if record["usage"]:
+        s.set(**record["usage"])
+
+
+async def chat(cache: bool = True, **kwargs):
+    """`CLIENT.chat.completions.create(**kwargs)` without blocking the event loop."""
+    with span(f"llm {kwargs.get('model')}", "llm", model=kwargs.get("model")) as s:
+        if CASSETTE.replaying:
+            record = await CASSETTE.replay_llm(kwargs)
+            _trace_response(s, record, "cassette")
+            return as_response(*from_record(record), cached=False)
+
+        key, record = _cache_lookup(cache, kwargs)
+        if record is not None:
+            response = as_response(*from_record(record))
+            source = "cache"
+        else:
+            loop = asyncio.get_running_loop()
+            started = []
+
+            def create():
+                started.append(time.perf_counter())
+                return CLIENT.chat.completions.create(**kwargs)
+
+            start = time.perf_counter()
+            response = await loop.run_in_executor(_executor, create)
+            # Time spent waiting for a free LLM thread (AGENT_LLM_THREADS)
+            s.set(queue_seconds=round(started[0] - start, 6))
+            record = to_record(response.choices[0].message, getattr(response, "usage", None), time.perf_counter() - start)
+            source = "provider"
+            if key is not None:
+                LLM_CACHE.put(key, record)
+
+        if CASSETTE.recording:
+            CASSETTE.record_llm(kwargs, record)
+        _trace_response(s, record, source)
+        return response
+
+
+_STREAM_END = object()
+
+
+def print_token(text: str) -> None:
+    """on_token callback for console clients: print the answer as it streams in."""
+    print(text, end="", flush=True)
+
+
+async def emit(callback, *args) -> None:
+    """Call a progress callback that may be sync or async."""
+    result = callback(*args)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def chat_stream(on_token, cache: bool = True, **kwargs) -> tuple:
+    """
+    Streaming `chat()`: `on_token(text)` (sync or async) gets each content delta as it arrives.
+    Returns (message, usage) once the stream ends. Tool-call fragments are reassembled into
+    `message.tool_calls`, so the caller can treat it like a non-streamed response message.
+    usage is None unless the provider sends it (OpenAI does with stream_options.include_usage).
+    A cached answer is handed to on_token in one piece.
+    """
+    with span(f"llm {kwargs.get('model')}", "llm", model=kwargs.get("model"), stream=True) as s:
+        return await _chat_stream(s, on_token, cache, kwargs)
+
+
+async def _chat_stream(s, on_token, cache: bool, kwargs: dict) -> tuple:
+    if CASSETTE.replaying:
+        record = await CASSETTE.replay_llm(kwargs)
+    else:
+        key, record = _cache_lookup(cache, kwargs)
+    if record is not None:
+        message, usage = from_record(record)
+        message.cached = not CASSETTE.replaying
+        if CASSETTE.recording:
+            CASSETTE.record_llm(kwargs, record)
+        _trace_response(s, record, "cassette" if CASSETTE.replaying else "cache")
+        if message.content:
+            await emit(on_token, message.content)
+        return message, usage
+
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    started = []
+
+    def pump():
+        # Runs on the LLM thread pool: drain the blocking iterator into the event loop's queue
+        started.append(time.perf_counter())
+        try:
+            for chunk in CLIENT.chat.completions.create(stream=True, **kwargs):
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+            return
+        loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+
+    pumping = loop.run_in_executor(_executor, pump)
+
+    content = []
+    tool_calls = {}
+    usage = None
+    try:
+        while (chunk := await queue.get()) is not _STREAM_END:
+            if isinstance(chunk, Exception):
+                raise chunk
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+
+            delta = chunk.choices[0].delta
+            if delta.content:
+                if not content:
+                    s.set(first_token_seconds=round(time.perf_counter() - start, 6))
+                content.append(delta.content)
+                await emit(on_token, delta.content)
+            for fragment in getattr(delta, "tool_calls", None) or []:
+                call = tool_calls.setdefault(fragment.index, {"id": None, "name": "", "arguments": ""})
+                call["id"] = fragment.id or call["id"]
+                if fragment.function is not None:
+                    call["name"] += fragment.function.name or ""
+                    call["arguments"] += fragment.function.arguments or ""
+    finally:
+        # Cancelled or failed mid-stream: let the worker thread stop reading
+        stop.set()
+    await pumping
+
+    message = SimpleNamespace(
+        role="assistant",
+        content="".join(content) or None,
+        tool_calls=[
+            SimpleNamespace(id=call["id"], type="function",
+                            function=SimpleNamespace(name=call["name"], arguments=call["arguments"]))
+            for _, call in sorted(tool_calls.items())
+        ] or None,
+    )
+    record = to_record(message, usage, time.perf_counter() - start)
+    if key is not None:
+        LLM_CACHE.put(key, record)
+    if CASSETTE.recording:
+        CASSETTE.record_llm(kwargs, record)
+    # Time spent waiting for a free LLM thread (AGENT_LLM_THREADS)
+    s.set(queue_seconds=round(started[0] - start, 6) if started else None)
+    _trace_response(s, record, "provider")
+    return message, usage
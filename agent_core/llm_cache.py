@@ -0,0 +1,163 @@
+# llm_cache.py
+# ------------
+# Content-addressed cache in front of every LLM call made through agent_core.llm.
+#
+# The key is a hash of model, messages, tools and temperature (plus any other request
+# options), so re-running a pipeline with the same prompts and tool_defs is answered
+# from the cache instead of the provider. Two tiers: an in-memory LRU and, if
+# AGENT_LLM_CACHE_DB is set, a SQLite file that survives restarts.
+#
+#   AGENT_LLM_CACHE=1                 turn it on (off by default: cached answers are deterministic)
+#   AGENT_LLM_CACHE_DB=llm_cache.db   on-disk tier
+#   AGENT_LLM_CACHE_MAX_ENTRIES=512   in-memory LRU size
+#
+# Stages whose output should vary run by run pass `cache=False` to chat() / AgentLoop. The
+# temperature=1.0 stages (planners, executors, reflector, comparisons, urgency classifier) all do,
+# so a cache hit never replaces a sample; only the lower-temperature summarising stages are cached.
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+CACHE_ENABLED = os.getenv("AGENT_LLM_CACHE", "0").lower() in ("1", "true", "yes", "on")
+CACHE_DB_PATH = os.getenv("AGENT_LLM_CACHE_DB", "")
+CACHE_MAX_ENTRIES = int(os.getenv("AGENT_LLM_CACHE_MAX_ENTRIES", "512"))
+
+# Request options that change how the answer is delivered, not what it is
+_TRANSPORT_KWARGS = {"stream", "stream_options"}
+
+
+def cache_key(kwargs: dict) -> str:
+    request = {k: v for k, v in kwargs.items() if k not in _TRANSPORT_KWARGS}
+    blob = json.dumps(request, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def to_record(message, usage, seconds: float) -> dict:
+    """The parts of a response the agents read, as plain JSON."""
+    record = {
+        "message": {
+            "role": getattr(message, "role", None) or "assistant",
+            "content": message.content,
+            "tool_calls": [
+                {"id": tc.id, "type": getattr(tc, "type", None) or "function",
+                 "function": {"name": tc.function.name, "arguments": tc.function.arguments}}
+                for tc in (getattr(message, "tool_calls", None) or [])
+            ] or None,
+        },
+        "usage": None,
+        "seconds": seconds,
+    }
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        record["usage"] = {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens or 0}
+    return record
+
+
+def from_record(record: dict) -> tuple:
+    """(message, usage) shaped like a provider response, so callers can't tell the difference."""
+    msg = record["message"]
+    message = SimpleNamespace(
+        role=msg["role"],
+        content=msg["content"],
+        tool_calls=[
+            SimpleNamespace(id=tc["id"], type=tc["type"],
+                            function=SimpleNamespace(name=tc["function"]["name"], arguments=tc["function"]["arguments"]))
+            for tc in msg["tool_calls"]
+        ] if msg["tool_calls"] else None,
+    )
+    usage = SimpleNamespace(**record["usage"]) if record["usage"] else None
+    return message, usage
+
+
+def as_response(message, usage, cached: bool = True):
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=usage, cached=cached)
+
+
+class ResponseCache:
+    """
+    In-memory LRU of LLM responses, optionally backed by SQLite.
+    Every hit adds the latency the original call took to `saved_seconds`.
+    """
+
+    def __init__(self, enabled: bool, max_entries: int, db_path: str = ""):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0       # calls that opted out with cache=False
+        self.saved_seconds = 0.0
+
+        self._db = None
+        if enabled and db_path:
+            self._db = sqlite3.connect(db_path)
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, record TEXT NOT NULL, stored_at REAL NOT NULL)")
+            self._db.commit()
+
+    def get(self, key: str) -> dict | None:
+        record = self._entries.get(key)
+        if record is not None:
+            self._entries.move_to_end(key)
+        elif self._db is not None:
+            row = self._db.execute("SELECT record FROM responses WHERE key = ?", (key,)).fetchone()
+            if row:
+                record = json.loads(row[0])
+                self._remember(key, record)
+                self.disk_hits += 1
+
+        if record is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.saved_seconds += record["seconds"]
+        return record
+
+    def put(self, key: str, record: dict) -> None:
+        self._remember(key, record)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, record, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(record), time.time()),
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, record: dict) -> None:
+        self._entries[key] = record
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "db_path": self.db_path or None,
+        }
+
+    def report(self) -> str:
+        s = self.stats()
+        return (f"[llm cache] {s['hits']}/{s['hits'] + s['misses']} hits ({s['hit_rate']:.0%}, {s['disk_hits']} from disk), "
+                f"{s['bypassed']} bypassed, saved {s['saved_seconds']:.1f}s of LLM time")
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+LLM_CACHE = ResponseCache(CACHE_ENABLED, CACHE_MAX_ENTRIES, CACHE_DB_PATH)
@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+from agent_core.tools import run_tools
+
+
+def recording_tools(log: list, delays: dict) -> dict:
+    """Fake tools that log when each call starts and ends; `delays` maps a call's `q` to its sleep."""
+    def make(name):
+        async def coroutine(q):
+            log.append(("start", q))
+            await asyncio.sleep(delays.get(q, 0))
+            log.append(("end", q))
+            return f"{name}: {q}"
+        return SimpleNamespace(coroutine=coroutine)
+    return {name: make(name) for name in ("run_cypher", "get_nodes")}
+
+
+def test_dependent_writes_keep_their_order():
+    log = []
+    tools = recording_tools(log, {"CREATE (:A)": 0.05})
+    calls = [("run_cypher", {"q": "CREATE (:A)"}), ("run_cypher", {"q": "MATCH (a:A) SET a.x = 1"})]
+    results = asyncio.run(run_tools(calls, tools, serial={"run_cypher"}))
+    assert results == ["run_cypher: CREATE (:A)", "run_cypher: MATCH (a:A) SET a.x = 1"]
+    assert log == [("start", "CREATE (:A)"), ("end", "CREATE (:A)"),
+                   ("start", "MATCH (a:A) SET a.x = 1"), ("end", "MATCH (a:A) SET a.x = 1")]
+
+
+def test_without_serial_dependent_writes_race():
+    log = []
+    tools = recording_tools(log, {"CREATE (:A)": 0.05})
+    calls = [("run_cypher", {"q": "CREATE (:A)"}), ("run_cypher", {"q": "MATCH (a:A) SET a.x = 1"})]
+    asyncio.run(run_tools(calls, tools))
+    assert log.index(("end", "MATCH (a:A) SET a.x = 1")) < log.index(("end", "CREATE (:A)"))
+
+
+def test_reads_around_a_write():
+    log = []
+    tools = recording_tools(log, {"r1": 0.05, "w": 0.02})
+    calls = [("get_nodes", {"q": "r1"}), ("get_nodes", {"q": "r2"}), ("run_cypher", {"q": "w"}),
+             ("get_nodes", {"q": "r3"}), ("get_nodes", {"q": "r4"})]
+    results = asyncio.run(run_tools(calls, tools, serial={"run_cypher"}))
+    assert results == ["get_nodes: r1", "get_nodes: r2", "run_cypher: w", "get_nodes: r3", "get_nodes: r4"]
+    # The reads before the write overlap, the write waits for both, the reads after it wait for the write
+    assert log[:2] == [("start", "r1"), ("start", "r2")]
+    assert log.index(("start", "w")) > log.index(("end", "r1"))
+    assert log.index(("start", "r3")) > log.index(("end", "w"))
+    assert log.index(("start", "r4")) > log.index(("end", "w"))
+
+
+def test_failed_write_still_releases_later_calls():
+    async def broken(q):
+        raise RuntimeError("boom")
+    log = []
+    tools = recording_tools(log, {})
+    tools["run_cypher"] = SimpleNamespace(coroutine=broken)
+    calls = [("run_cypher", {"q": "w"}), ("get_nodes", {"q": "r"})]
+    results = asyncio.run(run_tools(calls, tools, serial={"run_cypher"}))
+    assert results[0].startswith("ERROR")
+    assert results[1] == "get_nodes: r"
@@ -0,0 +1,122 @@
+# tools.py
+# --------
+# Runs the tool calls an LLM asked for in one turn.
+#
+# The calls of a turn don't depend on each other (the model only sees their results on the
+# next turn), so they run concurrently, at most AGENT_TOOL_CONCURRENCY at a time. Each call
+# gets its own AGENT_TOOL_TIMEOUT; a call that fails or times out comes back as an
+# "ERROR ..." string for the model to read instead of sinking the whole turn.
+#
+#   results = await run_tool_calls(msg.tool_calls, tool_mapping)     # OpenAI/Groq tool_calls
+#   results = await run_tools([(name, args), ...], tool_mapping)     # anything else
+#
+# Tools that write (neo4j's run_cypher) can be named in `serial`: such a call waits for every
+# call before it in the turn, and every call after it waits for it, so a CREATE then MATCH ... SET
+# in one turn runs in the order the model asked for.
+#
+# Results come back in the same order as the calls, so `role: "tool"` messages can be
+# appended in the original tool_call_id order. With AGENT_CASSETTE set, results are recorded
+# to, or replayed from, a cassette (cassette.py).
+
+import asyncio
+import inspect
+import json
+import os
+import time
+
+from agent_core.cassette import CASSETTE
+from agent_core.tracing import TRACING, span
+
+TOOL_CONCURRENCY = int(os.getenv("AGENT_TOOL_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.getenv("AGENT_TOOL_TIMEOUT", "60"))
+
+
+async def call_tool(tool_mapping: dict, tool_name: str, args, timeout: float = TOOL_TIMEOUT) -> str:
+    """Run one MCP tool; `args` may be a dict or the raw JSON string from the model."""
+    if tool_name not in tool_mapping:
+        return f"ERROR calling tool {tool_name}: unknown tool"
+
+    if isinstance(args, str):
+        try:
+            args = json.loads(args or "{}")
+        except json.JSONDecodeError as e:
+            return f"ERROR calling tool {tool_name}: arguments are not valid JSON ({e})"
+
+    print(f"Calling tool: {tool_name} with args: {args}")
+
+    if CASSETTE.replaying:
+        return await CASSETTE.replay_tool(tool_name, args)
+
+    start = time.perf_counter()
+    result = await _invoke(tool_mapping[tool_name], tool_name, args, timeout)
+    if CASSETTE.recording:
+        CASSETTE.record_tool(tool_name, args, result, time.perf_counter() - start)
+    return result
+
+
+async def _invoke(tool, tool_name: str, args: dict, timeout: float) -> str:
+    try:
+        result = await asyncio.wait_for(tool.coroutine(**args), timeout=timeout)
+    except asyncio.TimeoutError:
+        return f"ERROR calling tool {tool_name}: timed out after {timeout:g}s"
+    except Exception as e:
+        return f"ERROR calling tool {tool_name}: {e}"
+
+    return str(result)
+
+
+def _ordering(calls: list, serial) -> list:
+    """For each call, the indexes of the earlier calls it has to wait for"""
+    waits = []
+    barrier = None      # the latest serial call so far
+    for index, (tool_name, _) in enumerate(calls):
+        if tool_name in serial:
+            # Everything since (and including) the previous serial call
+            waits.append(list(range(barrier or 0, index)))
+            barrier = index
+        else:
+            waits.append([barrier] if barrier is not None else [])
+    return waits
+
+
+async def run_tools(calls: list, tool_mapping: dict, concurrency: int = TOOL_CONCURRENCY, timeout: float = TOOL_TIMEOUT,
+                    on_done=None, serial=frozenset()) -> list:
+    """
+    Run (tool_name, args) pairs concurrently, at most `concurrency` at a time; calls to the tools
+    named in `serial` run in call order, with nothing else running alongside them.
+    Returns one result string per call, in call order. Cancelling the caller cancels every call still running.
+    `on_done(index, result, seconds)` (sync or async) is called as each call finishes, in completion order.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    finished = [asyncio.Event() for _ in calls]
+    waits = _ordering(calls, serial)
+
+    async def bounded(index: int, tool_name: str, args) -> str:
+        with span(f"tool {tool_name}", "tool", tool=tool_name) as s:
+            queued = time.perf_counter()
+            try:
+                for earlier in waits[index]:
+                    await finished[earlier].wait()
+                async with semaphore:
+                    start = time.perf_counter()
+                    result = await call_tool(tool_mapping, tool_name, args, timeout)
+            finally:
+                finished[index].set()
+            # queue_seconds: waiting for a free slot (AGENT_TOOL_CONCURRENCY) or for an earlier serial call
+            s.set(queue_seconds=round(start - queued, 6), error=result.startswith("ERROR"))
+            if TRACING:
+                s.set(response_bytes=len(result.encode("utf-8")))
+        if on_done is not None:
+            done = on_done(index, result, time.perf_counter() - start)
+            if inspect.isawaitable(done):
+                await done
+        return result
+
+    return await asyncio.gather(*(bounded(i, tool_name, args) for i, (tool_name, args) in enumerate(calls)))
+
+
+async def run_tool_calls(tool_calls, tool_mapping: dict, concurrency: int = TOOL_CONCURRENCY, timeout: float = TOOL_TIMEOUT,
+                         on_done=None, serial=frozenset()) -> list:
+    """run_tools() for the `tool_calls` of an OpenAI/Groq chat message."""
+    calls = [(tc.function.name, tc.function.arguments) for tc in tool_calls]
+    return await run_tools(calls, tool_mapping, concurrency, timeout, on_done, serial)
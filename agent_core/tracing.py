@@ -0,0 +1,180 @@
+# tracing.py
+# ----------
+# Spans for where the time goes in an agent pipeline: one per stage (planner, executor, ...),
+# per agent turn, per LLM call and per tool call, with wall time, queue time, tokens and bytes.
+#
+#   with span("planner", "stage"):
+#       ...
+#   with span("llm " + model, "llm", model=model) as s:
+#       ...
+#       s.set(prompt_tokens=..., completion_tokens=...)
+#
+# Off unless AGENT_TRACE is set:
+#   AGENT_TRACE=trace.json   Chrome trace-event JSON, written at exit; open it in https://ui.perfetto.dev
+#   AGENT_TRACE=otel         OpenTelemetry spans (pip install opentelemetry-sdk). Uses the tracer
+#                            provider the app configured, or else exports over OTLP/HTTP
+#                            (opentelemetry-exporter-otlp-proto-http) or to the console.
+#
+# Concurrent work (parallel tool calls, overlapping requests) lands on separate tracks:
+# one per asyncio task in the JSON trace.
+
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+TRACE_TARGET = os.getenv("AGENT_TRACE", "")
+# The JSON trace is held in memory until exit; a long-running API stops adding events past this
+TRACE_MAX_EVENTS = int(os.getenv("AGENT_TRACE_MAX_EVENTS", "200000"))
+
+
+class Span:
+    def __init__(self, name: str, category: str, attrs: dict):
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+class _NoopSpan:
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class JsonTraceExporter:
+    """Collects spans as Chrome trace events ("ph": "X") and writes them to one JSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._events = []
+        self.dropped = 0
+        self._tracks = weakref.WeakKeyDictionary()    # asyncio task -> track number
+        self._thread_tracks = {}
+        self._next_track = 1
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        atexit.register(self.flush)
+
+    def _track(self) -> int:
+        try:
+            owner = asyncio.current_task()
+        except RuntimeError:
+            owner = None
+        tracks = self._tracks if owner is not None else self._thread_tracks
+        key = owner if owner is not None else threading.get_ident()
+        with self._lock:
+            track = tracks.get(key)
+            if track is None:
+                track = tracks[key] = self._next_track
+                self._next_track += 1
+        return track
+
+    def begin(self, span: Span):
+        span.track = self._track()
+        return None
+
+    def end(self, span: Span, handle) -> None:
+        event = {
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": round((span.start - self._origin) * 1e6, 1),
+            "dur": round(span.seconds * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": span.track,
+            "args": span.attrs,
+        }
+        with self._lock:
+            if len(self._events) < TRACE_MAX_EVENTS:
+                self._events.append(event)
+            else:
+                self.dropped += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            events = list(self._events)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"dropped_events": self.dropped}}, f, default=str)
+
+
+class OtelExporter:
+    def __init__(self):
+        from opentelemetry import context, trace
+
+        if type(trace.get_tracer_provider()).__name__ in ("ProxyTracerProvider", "NoOpTracerProvider"):
+            # Nobody configured OpenTelemetry: export ourselves
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+            try:
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+                exporter = OTLPSpanExporter()     # OTEL_EXPORTER_OTLP_ENDPOINT, default localhost:4318
+            except ImportError:
+                exporter = ConsoleSpanExporter()
+            provider = TracerProvider()
+            provider.add_span_processor(BatchSpanProcessor(exporter))
+            trace.set_tracer_provider(provider)
+            atexit.register(provider.shutdown)
+
+        self._trace = trace
+        self._context = context
+        self._tracer = trace.get_tracer("agent_core")
+
+    def begin(self, span: Span):
+        otel_span = self._tracer.start_span(span.name, attributes={"category": span.category})
+        # Make it the current span so spans opened inside it become its children
+        token = self._context.attach(self._trace.set_span_in_context(otel_span))
+        return otel_span, token
+
+    def end(self, span: Span, handle) -> None:
+        otel_span, token = handle
+        for key, value in span.attrs.items():
+            if value is not None:
+                otel_span.set_attribute(key, value if isinstance(value, (bool, int, float, str)) else json.dumps(value, default=str))
+        otel_span.end()
+        self._context.detach(token)
+
+    def flush(self) -> None:
+        pass
+
+
+def _make_exporter(target: str):
+    if not target:
+        return None
+    if target == "otel":
+        return OtelExporter()
+    return JsonTraceExporter(target)
+
+
+EXPORTER = _make_exporter(TRACE_TARGET)
+TRACING = EXPORTER is not None     # check before computing attributes that cost something
+
+
+@contextmanager
+def span(name: str, category: str = "agent", **attrs):
+    """Time a block as one span; `attrs` (and anything .set() later) become its attributes."""
+    if EXPORTER is None:
+        yield _NOOP
+        return
+
+    s = Span(name, category, attrs)
+    handle = EXPORTER.begin(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.set(error=repr(e))
+        raise
+    finally:
+        s.seconds = time.perf_counter() - s.start
+        EXPORTER.end(s, handle)
@@ -1,13 +1,13 @@
-import aisuite as ai
-CLIENT = ai.Client()
-
 import json
 
+from agent_core.engine import AgentLoop
+
 async def final_eval_ollama(
     reflection,
     tool_mapping,
     tool_defs,  # kept for signature symmetry; not used directly
     model: str = "ollama:gemma3:latest",
+    on_token=None,
 ) -> str:
     """
     Ollama-specific executor.
@@ -69,8 +69,9 @@ Constraints:
 - Do NOT include any text before or after the JSON.
 """
 
-    plan_response = CLIENT.chat.completions.create(
-        model=model,
+    agent = AgentLoop(model, tool_mapping, on_token=on_token)
+
+    executed_results = await agent.plan_tools(
         messages=[
             {
                 "role": "system",
@@ -81,50 +82,6 @@ Constraints:
         temperature=0.3,
     )
 
-    tool_plan_text = plan_response.choices[0].message.content or "[]"
-
-    try:
-        proposed_calls = json.loads(tool_plan_text)
-        if not isinstance(proposed_calls, list):
-            proposed_calls = []
-    except json.JSONDecodeError:
-        # If the model ignored instructions and didn't give valid JSON,
-        # fall back to no tool calls.
-        proposed_calls = []
-
-    # 2️⃣ Execute the proposed MCP tool calls
-    executed_results = []
-
-    for call in proposed_calls:  # safety cap at 5
-        tool_name = call.get("tool_name")
-        args = call.get("args", {}) or {}
-        purpose = call.get("purpose", "")
-
-        if tool_name not in tool_mapping:
-            continue
-
-        tool = tool_mapping[tool_name]
-
-        # args must be a dict
-        if not isinstance(args, dict):
-            continue
-
-        print(f"[Ollama executor] Calling tool: {tool_name} with args: {args}")
-
-        try:
-            result = await tool.coroutine(**args)
-        except Exception as e:
-            result = f"ERROR calling tool {tool_name}: {e}"
-
-        executed_results.append(
-            {
-                "tool_name": tool_name,
-                "args": args,
-                "purpose": purpose,
-                "result": str(result),
-            }
-        )
-
     # 3️⃣ Ask Ollama to synthesize final answer based on strategy + tool results
     results_json = json.dumps(executed_results, indent=2)
 
@@ -159,8 +116,7 @@ Now, write the final response to the user that accomplishes their goal.
 - Just give a clear, concise answer as a shopping assistant.
 """
 
-    final_response = CLIENT.chat.completions.create(
-        model=model,
+    final_text = await agent.complete_text(
         messages=[
             {
                 "role": "system",
@@ -171,5 +127,4 @@ Now, write the final response to the user that accomplishes their goal.
         temperature=0.6,
     )
 
-    final_text = final_response.choices[0].message.content or ""
     return final_text
\ No newline at end of file
@@ -1,9 +1,8 @@
-import aisuite as ai
-CLIENT = ai.Client()
-
 import json
 
-async def task_executor_groq(strategy,tool_mapping, tool_defs, model: str = "groq:llama-3.1-8b-instant") -> str:
+from agent_core.engine import AgentLoop
+
+async def task_executor_groq(strategy,tool_mapping, tool_defs, model: str = "groq:llama-3.1-8b-instant", on_token=None) -> str:
     """
     Groq-specific agent loop that uses MCP tools to compare LG vs Sony TV prices.
     Differs from the OpenAI version only in how it formats `role: "tool"` messages
@@ -19,6 +18,8 @@ async def task_executor_groq(strategy,tool_mapping, tool_defs, model: str = "gro
     Use tools if necessary.
 
     Do not fetch more than 5 items to avoid excessive data.
+    When you need details for several products, call `scrape_products` once with all of their URLs
+    instead of calling `scrape_product` for each one.
 
 
 
@@ -31,81 +32,8 @@ async def task_executor_groq(strategy,tool_mapping, tool_defs, model: str = "gro
         {"role": "user", "content": prompt},
     ]
 
-    final_text = ""
-
-    for i in range(max_turns):
-        # print(f"\n**********************************************************************************\n")
-        print(f"Attempt : {i+1}")
-
-        # Call Groq chat completions
-        response = CLIENT.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools=tool_defs,
-            temperature=1.0,
-        )
-
-        msg = response.choices[0].message
-
-        # Build assistant message we send back next turn
-        assistant_msg = {
-            "role": msg.role,
-            "content": msg.content or "",
-        }
-
-        # Keep tool_calls so Groq knows why tool messages follow
-        if getattr(msg, "tool_calls", None):
-            assistant_msg["tool_calls"] = [
-                {
-                    "id": tc.id,
-                    "type": tc.type,
-                    "function": {
-                        "name": tc.function.name,
-                        "arguments": tc.function.arguments,
-                    },
-                }
-                for tc in msg.tool_calls
-            ]
-
-        messages.append(assistant_msg)
-
-        # If no tool calls, this is the final answer
-        if not getattr(msg, "tool_calls", None):
-            final_text = msg.content
-            print("✅ Final answer:")
-            print(final_text)
-            break
-
-        # print("Tool Calls Detected:")
-        # print(msg.tool_calls)
-
-        # Execute each requested tool
-        for tool_call in msg.tool_calls:
-            tool_id = tool_call.id
-            tool_name = tool_call.function.name
-            tool_args = tool_call.function.arguments
-
-            args = json.loads(tool_args or "{}")
-
-            print(f"Calling tool: {tool_name} with args: {tool_args}")
-
-            tool = tool_mapping[tool_name]
-            tool_response = await tool.coroutine(**args)
-
-            # print(f"Tool response: {tool_response}")
-
-            # 🔴 IMPORTANT for Groq:
-            # - No `tool_name` field (Groq rejects it)
-            # - Just role, tool_call_id, content
-            messages.append(
-                {
-                    "role": "tool",
-                    "tool_call_id": tool_id,
-                    "content": str(tool_response),
-                }
-            )
-
-    return final_text
+    agent = AgentLoop(model, tool_mapping, tool_defs, max_turns=max_turns, on_token=on_token, cache=False)
+    return await agent.run(messages, temperature=1.0)
 
 
 async def task_executor_ollama(
@@ -113,6 +41,7 @@ async def task_executor_ollama(
     tool_mapping,
     tool_defs,  # kept for signature symmetry; not used directly
     model: str = "ollama:gemma3:latest",
+    on_token=None,
 ) -> str:
     """
     Ollama-specific executor.
@@ -153,12 +82,14 @@ Return STRICTLY a JSON array, no prose, of the form:
 
 Constraints:
 
+- To get details for several products, propose ONE `scrape_products` call with all of their URLs.
 - Make sure "args" is a valid JSON object, not a string.
 - Do NOT include any text before or after the JSON.
 """
 
-    plan_response = CLIENT.chat.completions.create(
-        model=model,
+    agent = AgentLoop(model, tool_mapping, on_token=on_token)
+
+    executed_results = await agent.plan_tools(
         messages=[
             {
                 "role": "system",
@@ -169,50 +100,6 @@ Constraints:
         temperature=0.3,
     )
 
-    tool_plan_text = plan_response.choices[0].message.content or "[]"
-
-    try:
-        proposed_calls = json.loads(tool_plan_text)
-        if not isinstance(proposed_calls, list):
-            proposed_calls = []
-    except json.JSONDecodeError:
-        # If the model ignored instructions and didn't give valid JSON,
-        # fall back to no tool calls.
-        proposed_calls = []
-
-    # 2️⃣ Execute the proposed MCP tool calls
-    executed_results = []
-
-    for call in proposed_calls:  # safety cap at 5
-        tool_name = call.get("tool_name")
-        args = call.get("args", {}) or {}
-        purpose = call.get("purpose", "")
-
-        if tool_name not in tool_mapping:
-            continue
-
-        tool = tool_mapping[tool_name]
-
-        # args must be a dict
-        if not isinstance(args, dict):
-            continue
-
-        print(f"[Ollama executor] Calling tool: {tool_name} with args: {args}")
-
-        try:
-            result = await tool.coroutine(**args)
-        except Exception as e:
-            result = f"ERROR calling tool {tool_name}: {e}"
-
-        executed_results.append(
-            {
-                "tool_name": tool_name,
-                "args": args,
-                "purpose": purpose,
-                "result": str(result),
-            }
-        )
-
     # 3️⃣ Ask Ollama to synthesize final answer based on strategy + tool results
     results_json = json.dumps(executed_results, indent=2)
 
@@ -232,8 +119,7 @@ Now, write the final response to the user that accomplishes their goal.
 - Just give a clear, concise answer as a shopping assistant.
 """
 
-    final_response = CLIENT.chat.completions.create(
-        model=model,
+    final_text = await agent.complete_text(
         messages=[
             {
                 "role": "system",
@@ -244,5 +130,4 @@ Now, write the final response to the user that accomplishes their goal.
         temperature=0.6,
     )
 
-    final_text = final_response.choices[0].message.content or ""
     return final_text
\ No newline at end of file
@@ -0,0 +1,110 @@
+# bench_fetch.py
+# --------------
+# Replays N page fetches against a local stub HTTP server and compares
+# the pooled client in server.py with the old one-client-per-call fetch.
+#
+# Run:
+#   python bench_fetch.py --requests 200 --connect-delay-ms 30
+#
+# --connect-delay-ms is added once per new TCP connection to stand in for
+# the DNS + TCP + TLS setup that a real Amazon fetch pays.
+
+import argparse
+import asyncio
+import logging
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+import server
+
+# mcp turns on INFO logging at import; one httpx line per request drowns the report
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Measure the network path only: every replayed fetch must miss the page cache
+server.PAGE_CACHE = server.PageCache(ttl=0, max_entries=0, max_bytes=0)
+# ...and must not be paced by the per-host rate limiter
+server.LIMITER = server.ratelimit.HostLimiter(rate=0, burst=0)
+
+STUB_BODY = ("<html><body><span id='productTitle'>Stub Phone</span>"
+             + "<div class='filler'>lorem ipsum</div>" * 4000
+             + "</body></html>").encode("utf-8")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so pooled connections are actually reused
+    connect_delay = 0.0
+
+    def setup(self):
+        # Called once per accepted connection
+        time.sleep(self.connect_delay)
+        super().setup()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(STUB_BODY)))
+        self.end_headers()
+        self.wfile.write(STUB_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(connect_delay: float) -> ThreadingHTTPServer:
+    StubHandler.connect_delay = connect_delay
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+async def fetch_unpooled(url: str) -> str:
+    """The pre-pool behaviour: a brand-new client (and connection) per fetch."""
+    async with httpx.AsyncClient(headers=server.HEADERS) as client:
+        response = await client.get(url, timeout=server.REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.text
+
+
+async def replay(fetch, url: str, n: int, concurrency: int) -> list:
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            await fetch(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(n)))
+    return latencies
+
+
+def report(label: str, latencies: list) -> None:
+    q = statistics.quantiles(latencies, n=100)
+    print(f"{label:<10} n={len(latencies):<5} p50={q[49]:8.2f} ms   p99={q[98]:8.2f} ms   mean={statistics.mean(latencies):8.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Pooled vs. unpooled fetch latency")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--connect-delay-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    httpd = start_stub_server(args.connect_delay_ms / 1000)
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/dp/B0STUB0001"
+
+    try:
+        report("unpooled", await replay(fetch_unpooled, url, args.requests, args.concurrency))
+        report("pooled", await replay(server.fetch_amazon_page, url, args.requests, args.concurrency))
+    finally:
+        await server._close_http_client()
+        httpd.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
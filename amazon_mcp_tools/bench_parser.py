@@ -0,0 +1,95 @@
+# bench_parser.py
+# ---------------
+# Parses the saved HTML pages in fixtures/ with every installed parser backend
+# and reports pages/sec, peak RSS, and whether the extracted dicts match the
+# BeautifulSoup reference output.
+#
+# Run:
+#   python bench_parser.py --rounds 20
+#   python bench_parser.py --fixtures ~/saved_amazon_pages
+#
+# Files named search_*.html go through extract_search_results, everything
+# else through extract_product_data. Each backend runs in its own process
+# so its peak RSS isn't polluted by the others.
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_backend(backend_name: str, fixture_dir: str, rounds: int) -> dict:
+    import parsers
+    import server
+
+    backend = parsers.get_backend(backend_name)
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append((os.path.basename(path), f.read()))
+
+    def extract(name: str, html: str):
+        if name.startswith("search"):
+            return server.extract_search_results(html, 100, backend)
+        return server.extract_product_data(html, name, backend)
+
+    outputs = {name: extract(name, html) for name, html in pages}   # also warms up
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name, html in pages:
+            extract(name, html)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "backend": backend_name,
+        "pages": len(pages) * rounds,
+        "pages_per_sec": len(pages) * rounds / elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+        "digest": hashlib.sha256(json.dumps(outputs, sort_keys=True).encode("utf-8")).hexdigest(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parser backend throughput and memory")
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures"))
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)   # internal: run one backend and print JSON
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args.fixtures, args.rounds)))
+        return
+
+    import parsers
+
+    results = []
+    for name in parsers.available_backends():
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--backend", name,
+             "--fixtures", args.fixtures, "--rounds", str(args.rounds)],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    reference = next((r["digest"] for r in results if r["backend"] == "bs4"), None)
+
+    print(f"{'backend':<12}{'pages':>7}{'pages/sec':>12}{'peak RSS':>12}   output")
+    for r in results:
+        same = "reference" if r["backend"] == "bs4" else ("identical" if r["digest"] == reference else "DIFFERS")
+        print(f"{r['backend']:<12}{r['pages']:>7}{r['pages_per_sec']:>12.1f}{r['peak_rss_mb']:>9.1f} MB   {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 import os
+import sys
 import json
 import asyncio
 from dotenv import load_dotenv
+# The agents import helpers from agent_core/ at the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import agents.planner, agents.task_executor, agents.reflector, agents.final_eval
+from agent_core.llm import print_token
+from agent_core.cassette import CASSETTE
+from agent_core.llm_cache import LLM_CACHE
+from agent_core.tracing import span
 
 
 # MCP + LangChain imports
@@ -44,41 +51,58 @@ async def main():
     # 2️⃣ Initialize MCP client
     client = MultiServerMCPClient(mcp_servers)
 
-    # 3️⃣ Ensure OpenAI key is available
-    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-    if not os.environ.get("OPENAI_API_KEY"):
-        raise ValueError("❌ OPENAI_API_KEY not found in .env file!")
-
-    # 4️⃣ Collect tools exposed by the MCP servers
-    tools = await client.get_tools()
-
-    if tools:
-        tool_defs = [tool_def_maker.lc_tool_to_openai_def(t) for t in tools]
-        tool_mapping = tool_def_maker.build_tool_mapping(tools, tool_defs)
+    if CASSETTE.replaying:
+        # Offline: the tool list and every LLM / tool answer come from the cassette
+        tool_defs = CASSETTE.value("tool_defs")
+        tool_mapping = CASSETTE.replay_tool_mapping(tool_defs)
+    else:
+        # 3️⃣ Ensure OpenAI key is available
+        os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+        if not os.environ.get("OPENAI_API_KEY"):
+            raise ValueError("❌ OPENAI_API_KEY not found in .env file!")
+
+        # 4️⃣ Collect tools exposed by the MCP servers
+        tools = await client.get_tools()
+
+        if tools:
+            tool_defs = [tool_def_maker.lc_tool_to_openai_def(t) for t in tools]
+            tool_mapping = tool_def_maker.build_tool_mapping(tools, tool_defs)
+            if CASSETTE.recording:
+                CASSETTE.record_value("tool_defs", tool_defs)
 
     
-    strategy= agents.planner.planner_ollama("Find the best phone under $1000.",tool_defs)
+    with span("planner", "stage"):
+        strategy= await agents.planner.planner_ollama("Find the best phone under $1000.",tool_defs)
     print(strategy)
     print("*************************")
 
-    answer = await agents.task_executor.task_executor_ollama(strategy,tool_mapping,tool_defs)
-    print(answer)
+    with span("task_executor", "stage"):
+        answer = await agents.task_executor.task_executor_ollama(strategy,tool_mapping,tool_defs,on_token=print_token)
+    print()
     print("*************************")
 
     # # import time
 
     # # time.sleep(30)
 
-    reflection = await agents.reflector.reflector_ollama(strategy, answer,tool_mapping,tool_defs)
-    print(reflection)
+    with span("reflector", "stage"):
+        reflection = await agents.reflector.reflector_ollama(strategy, answer,tool_mapping,tool_defs,on_token=print_token)
+    print()
     print("*************************")
 
 
 
-    eval = await agents.final_eval.final_eval_ollama(reflection,tool_mapping,tool_defs)
-    print(eval)
+    with span("final_eval", "stage"):
+        eval = await agents.final_eval.final_eval_ollama(reflection,tool_mapping,tool_defs,on_token=print_token)
+    print()
     print("*************************")
 
+    if LLM_CACHE.enabled:
+        print(LLM_CACHE.report())
+    if CASSETTE.mode:
+        print(f"[cassette] {CASSETTE.stats()}")
+        CASSETTE.close()
+
 
     
     # x= await agents.compare_products.compare_products_groq(tool_mapping,tool_defs)
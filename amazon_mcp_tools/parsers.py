@@ -0,0 +1,149 @@
+# parsers.py
+# ----------
+# Pluggable HTML parser backends for the Amazon scraper.
+#
+# Every backend exposes the same small API, so the extraction code in server.py
+# doesn't care which parser built the tree:
+#
+#   doc  = backend.parse(html)
+#   sel  = backend.compile(css_selector)      # do this once, reuse for every page
+#   node = backend.select_one(doc_or_node, sel)   # first match or None
+#   nodes = backend.select(doc_or_node, sel)      # all matches
+#   backend.text(node)         # concatenated text, like BeautifulSoup's get_text()
+#   backend.attr(node, name)   # attribute value or None
+#
+# Backends (pick with AMAZON_PARSER=auto|selectolax|lxml|bs4, default auto):
+#   selectolax - Lexbor, C; fastest
+#   lxml       - libxml2, C (with cssselect)
+#   bs4        - BeautifulSoup + html.parser, pure Python
+#
+# All three are project dependencies (pyproject.toml). `auto` picks the first one that is
+# installed, in that order, so a trimmed-down install still works on bs4.
+
+import importlib.util
+import os
+
+import soupsieve
+from bs4 import BeautifulSoup
+
+# BeautifulSoup's get_text() skips the contents of these tags; the C backends drop them
+# right after parsing so every backend returns the same text.
+NON_TEXT_TAGS = ["script", "style", "template"]
+
+
+class SoupBackend:
+    name = "bs4"
+
+    def parse(self, html: str):
+        return BeautifulSoup(html, 'html.parser')
+
+    def compile(self, selector: str):
+        return soupsieve.compile(selector)
+
+    def select_one(self, node, compiled):
+        return compiled.select_one(node)
+
+    def select(self, node, compiled) -> list:
+        return compiled.select(node)
+
+    def text(self, node) -> str:
+        return node.get_text()
+
+    def attr(self, node, name: str):
+        return node.get(name)
+
+
+class SelectolaxBackend:
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser = LexborHTMLParser
+
+    def parse(self, html: str):
+        tree = self._parser(html)
+        tree.strip_tags(NON_TEXT_TAGS)
+        return tree
+
+    def compile(self, selector: str):
+        # Lexbor has no reusable compiled-selector object; its selector parser is C and cheap
+        return selector
+
+    def select_one(self, node, compiled):
+        return node.css_first(compiled)
+
+    def select(self, node, compiled) -> list:
+        return node.css(compiled)
+
+    def text(self, node) -> str:
+        return node.text(deep=True)
+
+    def attr(self, node, name: str):
+        return node.attributes.get(name)
+
+
+class LxmlBackend:
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.etree
+        import lxml.html
+        from lxml.cssselect import CSSSelector
+        self._etree = lxml.etree
+        self._html = lxml.html
+        self._css = CSSSelector
+
+    def parse(self, html: str):
+        doc = self._html.document_fromstring(html)
+        self._etree.strip_elements(doc, *NON_TEXT_TAGS, with_tail=False)
+        return doc
+
+    def compile(self, selector: str):
+        # CSS -> XPath translation happens once; the `[1]` variant lets libxml2 stop at the first match
+        every = self._css(selector)
+        first = self._etree.XPath(f"({every.path})[1]")
+        return first, every
+
+    def select_one(self, node, compiled):
+        matches = compiled[0](node)
+        return matches[0] if matches else None
+
+    def select(self, node, compiled) -> list:
+        return compiled[1](node)
+
+    def text(self, node) -> str:
+        return node.text_content()
+
+    def attr(self, node, name: str):
+        return node.get(name)
+
+
+BACKENDS = {
+    "selectolax": (SelectolaxBackend, ["selectolax"]),
+    "lxml": (LxmlBackend, ["lxml", "cssselect"]),
+    "bs4": (SoupBackend, ["bs4"]),
+}
+
+
+def available_backends() -> list:
+    """Names of the backends whose packages are installed, fastest first."""
+    return [
+        name for name, (_, modules) in BACKENDS.items()
+        if all(importlib.util.find_spec(m) is not None for m in modules)
+    ]
+
+
+def get_backend(name: str = "auto"):
+    """Return a backend instance by name; `auto` means the fastest installed one."""
+    if name == "auto":
+        name = available_backends()[0]
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown parser backend: {name!r} (choose from auto, {', '.join(BACKENDS)})")
+
+    backend_cls, _ = BACKENDS[name]
+    return backend_cls()
+
+
+# Backend used by the server unless a caller passes its own
+DEFAULT_BACKEND = get_backend(os.getenv("AMAZON_PARSER", "auto"))
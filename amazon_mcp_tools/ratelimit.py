@@ -0,0 +1,143 @@
+# ratelimit.py
+# ------------
+# Per-host request pacing for the Amazon fetcher.
+#
+#   limiter = HostLimiter(rate=2, burst=5)
+#   await limiter.acquire("www.amazon.com")    # waits for a token, or raises Throttled during a cool-down
+#   limiter.throttled("www.amazon.com")        # got a 429/503: halve that host's rate
+#   limiter.succeeded("www.amazon.com")        # got a page: creep back toward the configured rate
+#   limiter.cool_down("www.amazon.com", 60)    # got a captcha: stop sending to that host for a while
+#
+# Each host has its own token bucket. The rate adapts AIMD-style (halve on throttle, add
+# back a tenth of the configured rate per success), so a host that starts pushing back is
+# paced down instead of being hammered with retries. rate=0 turns pacing off.
+
+import asyncio
+import random
+import time
+
+
+class Throttled(Exception):
+    """The host is cooling down after a captcha; `retry_after` is how many seconds are left."""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"{host} is cooling down after a captcha page; retry in {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.cooldown_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns the seconds spent waiting."""
+        # The lock makes waiters queue in order instead of all waking up for the same token
+        async with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = 0.0
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                await asyncio.sleep(wait)
+                self._refill(time.monotonic())
+            self.tokens -= 1
+            return wait
+
+
+class HostLimiter:
+    def __init__(self, rate: float, burst: int, min_rate: float = 0.1):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min(min_rate, rate) if rate > 0 else 0
+        self._buckets = {}
+        self.requests = 0
+        self.delayed = 0          # requests that had to wait for a token
+        self.wait_seconds = 0.0
+        self.throttle_responses = 0
+        self.retries = 0
+        self.captchas = 0
+        self.rejected = 0         # requests refused outright during a cool-down
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    async def acquire(self, host: str) -> None:
+        self.requests += 1
+        bucket = self._bucket(host)
+
+        remaining = bucket.cooldown_until - time.monotonic()
+        if remaining > 0:
+            self.rejected += 1
+            raise Throttled(host, remaining)
+
+        if self.rate <= 0:
+            return
+
+        wait = await bucket.acquire()
+        if wait > 0:
+            self.delayed += 1
+            self.wait_seconds += wait
+
+    def throttled(self, host: str) -> None:
+        self.throttle_responses += 1
+        bucket = self._bucket(host)
+        if self.rate > 0:
+            bucket.rate = max(self.min_rate, bucket.rate / 2)
+
+    def succeeded(self, host: str) -> None:
+        bucket = self._bucket(host)
+        if self.rate > 0 and bucket.rate < bucket.base_rate:
+            bucket.rate = min(bucket.base_rate, bucket.rate + bucket.base_rate / 10)
+
+    def cool_down(self, host: str, seconds: float) -> None:
+        self.captchas += 1
+        bucket = self._bucket(host)
+        bucket.cooldown_until = time.monotonic() + seconds
+        if self.rate > 0:
+            bucket.rate = max(self.min_rate, bucket.rate / 2)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        hosts = {}
+        for host, bucket in self._buckets.items():
+            bucket._refill(now)
+            hosts[host] = {
+                'rate_per_sec': round(bucket.rate, 3),
+                'tokens': round(bucket.tokens, 2),
+                'cooldown_remaining_sec': round(max(0.0, bucket.cooldown_until - now), 1),
+            }
+
+        return {
+            'configured_rate_per_sec': self.rate,
+            'burst': self.burst,
+            'requests': self.requests,
+            'delayed': self.delayed,
+            'wait_seconds': round(self.wait_seconds, 3),
+            'throttle_responses': self.throttle_responses,
+            'retries': self.retries,
+            'captchas': self.captchas,
+            'rejected_during_cooldown': self.rejected,
+            'hosts': hosts,
+        }
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: float | None = None) -> float:
+    """Full-jitter exponential backoff; a server-sent Retry-After wins when it is longer."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(cap, retry_after))
+    return delay
@@ -1,15 +1,379 @@
 # This is amazon products scraper mcp server
 # Build a scraper that can scrape amazon products
 # The scraper should be able to scrape the product name, price, and image
+import os
+import asyncio
+import codecs
+import json
+import importlib.util
+import math
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
 import httpx
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 import re
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
+import sys
+import parsers
+import ratelimit
+from urllib.parse import urlparse, parse_qs
+
+# Constants
+# BASE_URL = "https://api.trello.com/1"
+# API_KEY = os.getenv("TRELLO_API_KEY")
+# API_TOKEN = os.getenv("TRELLO_API_TOKEN")
+BASE_URL = "https://www.amazon.com"
+
+# Connection pool settings (one pool is shared by every tool call for the life of the server)
+# HTTP/2 comes from `httpx[http2]` (a project dependency); an environment without `h2` stays on HTTP/1.1 keep-alive.
+HTTP2_ENABLED = os.getenv("AMAZON_HTTP2", "1") == "1" and importlib.util.find_spec("h2") is not None
+MAX_CONNECTIONS = int(os.getenv("AMAZON_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AMAZON_MAX_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("AMAZON_KEEPALIVE_EXPIRY", "30"))
+REQUEST_TIMEOUT = 15.0
+
+# Batch scraping (scrape_products): how many pages are fetched at once, and how many URLs one call may take
+BATCH_CONCURRENCY = int(os.getenv("AMAZON_BATCH_CONCURRENCY", "5"))
+MAX_BATCH_URLS = int(os.getenv("AMAZON_MAX_BATCH_URLS", "20"))
+
+# Search pagination (search_products): never read past this many result pages for one query
+SEARCH_MAX_PAGES = int(os.getenv("AMAZON_SEARCH_MAX_PAGES", "5"))
+
+# Page cache: TTL in seconds (0 disables caching), LRU caps, and an optional SQLite file that survives restarts
+CACHE_TTL = float(os.getenv("AMAZON_CACHE_TTL", "900"))
+CACHE_MAX_ENTRIES = int(os.getenv("AMAZON_CACHE_MAX_ENTRIES", "256"))
+CACHE_MAX_BYTES = int(os.getenv("AMAZON_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_DB_PATH = os.getenv("AMAZON_CACHE_DB", "")
+# Expired pages that came with an ETag/Last-Modified are kept this much longer so they can be revalidated with a conditional GET
+CACHE_REVALIDATE_WINDOW = float(os.getenv("AMAZON_CACHE_REVALIDATE_WINDOW", str(24 * 3600)))
+
+# Streaming product fetch: stop downloading once every section extract_product_data reads has arrived,
+# or after this many body bytes (0 turns streaming off and always downloads the full page).
+# A streamed body is usually cut short, so it is cached under its own key (see cache_key) and never served to a full fetch.
+STREAM_BYTE_BUDGET = int(os.getenv("AMAZON_STREAM_BYTE_BUDGET", str(1024 * 1024)))
+STREAM_TAIL_BYTES = 32 * 1024      # keep reading this much past the last section start so its element closes
+
+# Rate limiting: per-host token bucket (AMAZON_RATE requests/sec, 0 disables), retries with jittered
+# exponential backoff on 429/503, and a cool-down for a host that answers with a captcha page
+RATE_PER_HOST = float(os.getenv("AMAZON_RATE", "2"))
+RATE_BURST = int(os.getenv("AMAZON_RATE_BURST", "5"))
+MAX_RETRIES = int(os.getenv("AMAZON_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("AMAZON_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("AMAZON_BACKOFF_MAX", "20"))
+CAPTCHA_COOLDOWN = float(os.getenv("AMAZON_CAPTCHA_COOLDOWN", "120"))
+RETRY_STATUSES = {429, 503}
+
+# No `Connection` header: the pool manages keep-alive, and HTTP/2 forbids connection-specific headers
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Single shared client (lazy init, opened/closed by the server lifespan)
+_http_client: httpx.AsyncClient | None = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared pooled HTTP client, create it on first use."""
+    global _http_client
+
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            headers=HEADERS,
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    return _http_client
+
+
+async def _close_http_client() -> None:
+    """Close the shared HTTP client and drop its pooled connections."""
+    global _http_client
+
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# Page cache
+
+ASIN_RE = re.compile(r'/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})(?:[/?]|$)', re.IGNORECASE)
+
+
+def cache_key(url: str, sections: dict | None = None) -> str:
+    """
+    Normalize a page URL into a cache key.
+    Product pages are keyed on their ASIN and searches on the normalized query plus page,
+    so tracking parameters and slugs in the URL don't cause misses.
+    A fetch that streams only `sections` of the page gets a key of its own, so a truncated
+    body is never returned to a caller that asked for the whole page.
+    """
+    if sections and STREAM_BYTE_BUDGET > 0:
+        return f"{cache_key(url)}#sections"
+
+    parsed = urlparse(url)
+    host = parsed.netloc.lower().removeprefix('www.')
+
+    asin_match = ASIN_RE.search(parsed.path)
+    if asin_match:
+        return f"product:{host}:{asin_match.group(1).upper()}"
+
+    params = parse_qs(parsed.query)
+    if parsed.path.rstrip('/') == '/s' and 'k' in params:
+        query = " ".join(params['k'][0].lower().split())
+        page = params.get('page', ['1'])[0]
+        return f"search:{host}:{query}:{page}"
+
+    return f"url:{host}{parsed.path.rstrip('/')}?{'&'.join(sorted(parsed.query.split('&')))}"
+
+
+@dataclass
+class CacheEntry:
+    body: str
+    stored_at: float
+    size: int
+    etag: str | None = None
+    last_modified: str | None = None
+    parsed: dict | None = None      # extract_product_data() output for this body, so a 304 can skip parsing
+
+    def validators(self) -> dict:
+        """Conditional-request headers for revalidating this body"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """
+    In-memory TTL + LRU cache of fetched page bodies, capped by entry count and total bytes.
+    If db_path is set, entries are also written to SQLite and read back on a memory miss; the
+    file is held to the same caps, oldest pages going first.
+    Expired entries that carry validators stay around (for CACHE_REVALIDATE_WINDOW) so the
+    fetcher can revalidate them with a conditional GET instead of downloading them again.
+    """
+
+    # Columns added to `pages` after the first release; _open_db adds whichever an older file lacks
+    ADDED_COLUMNS = (("etag", "TEXT"), ("last_modified", "TEXT"), ("parsed", "TEXT"), ("size", "INTEGER"))
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int, db_path: str = "",
+                 revalidate_window: float = CACHE_REVALIDATE_WINDOW):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.revalidate_window = revalidate_window
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.revalidations = 0
+        self.not_modified = 0
+        self.parse_skips = 0
+
+        self._db = None
+        if db_path and ttl > 0:
+            self._open_db()
+
+    def _open_db(self) -> None:
+        self._db = sqlite3.connect(self.db_path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, body TEXT NOT NULL, stored_at REAL NOT NULL)")
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(pages)")}
+        for name, sql_type in self.ADDED_COLUMNS:
+            if name not in columns:
+                self._db.execute(f"ALTER TABLE pages ADD COLUMN {name} {sql_type}")
+        self._db.execute(
+            "DELETE FROM pages WHERE stored_at < ? AND ((etag IS NULL AND last_modified IS NULL) OR stored_at < ?)",
+            (time.time() - self.ttl, time.time() - self.ttl - self.revalidate_window),
+        )
+        self._prune_db()
+        self._db.commit()
+
+    def _revalidatable(self, entry: CacheEntry, now: float) -> bool:
+        return bool(entry.etag or entry.last_modified) and now - entry.stored_at < self.ttl + self.revalidate_window
+
+    def lookup(self, key: str) -> tuple:
+        """
+        Return (entry, fresh) for a key (memory first, then SQLite). A stale entry is only returned
+        when it can still be revalidated; otherwise (None, False).
+        """
+        if self.ttl <= 0:
+            return None, False
+
+        now = time.time()
+        entry = self._entries.get(key)
+        from_disk = False
+        if entry is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT body, stored_at, etag, last_modified, parsed FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                entry = CacheEntry(body=row[0], stored_at=row[1], size=len(row[0].encode('utf-8')),
+                                   etag=row[2], last_modified=row[3], parsed=json.loads(row[4]) if row[4] else None)
+                from_disk = True
+
+        if entry is not None:
+            if now - entry.stored_at < self.ttl:
+                if from_disk:
+                    self._remember(key, entry)
+                    self.disk_hits += 1
+                else:
+                    self._entries.move_to_end(key)
+                self.hits += 1
+                return entry, True
+            if self._revalidatable(entry, now):
+                if from_disk:
+                    self._remember(key, entry)
+                self.revalidations += 1
+                return entry, False
+            self._forget(key)
+
+        self.misses += 1
+        return None, False
+
+    def get(self, key: str) -> str | None:
+        """Return a fresh cached body or None."""
+        entry, fresh = self.lookup(key)
+        return entry.body if fresh else None
+
+    def put(self, key: str, body: str, etag: str | None = None, last_modified: str | None = None) -> CacheEntry:
+        entry = CacheEntry(body=body, stored_at=time.time(), size=len(body.encode('utf-8')),
+                           etag=etag, last_modified=last_modified)
+        if self.ttl <= 0:
+            return entry
+
+        self._remember(key, entry)
+        self._write(key, entry)
+        return entry
+
+    def refresh(self, key: str, entry: CacheEntry) -> CacheEntry:
+        """
+        The server answered 304: the stored body (and its parsed form) are good for another TTL.
+        The entry goes back into both tiers, since it may have been evicted from memory or come from disk.
+        """
+        self.not_modified += 1
+        entry.stored_at = time.time()
+        if self.ttl <= 0:
+            return entry
+
+        self._remember(key, entry)
+        self._write(key, entry)
+        return entry
+
+    def set_parsed(self, key: str, entry: CacheEntry, parsed: dict) -> None:
+        entry.parsed = dict(parsed)
+        if self._db is not None and key in self._entries:
+            self._db.execute("UPDATE pages SET parsed = ? WHERE key = ?", (json.dumps(entry.parsed), key))
+            self._db.commit()
+
+    def _write(self, key: str, entry: CacheEntry) -> None:
+        """Upsert the entry into SQLite, then prune the file back under the caps"""
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO pages (key, body, stored_at, etag, last_modified, parsed, size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, entry.body, entry.stored_at, entry.etag, entry.last_modified,
+             json.dumps(entry.parsed) if entry.parsed is not None else None, entry.size),
+        )
+        self._prune_db()
+        self._db.commit()
+
+    def _prune_db(self) -> None:
+        # Newest first: keep rows while both caps hold, delete the rest (rows from before the
+        # size column fall back to their character count)
+        rows = self._db.execute("SELECT key, COALESCE(size, LENGTH(body)) FROM pages ORDER BY stored_at DESC").fetchall()
+        kept = kept_bytes = 0
+        stale = []
+        for key, size in rows:
+            if kept < self.max_entries and kept_bytes + size <= self.max_bytes:
+                kept += 1
+                kept_bytes += size
+            else:
+                stale.append((key,))
+        if stale:
+            self._db.executemany("DELETE FROM pages WHERE key = ?", stale)
+            self.disk_evictions += len(stale)
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        self._forget(key)
+        if entry.size > self.max_bytes:
+            return
+
+        self._entries[key] = entry
+        self._bytes += entry.size
+
+        # Evict least recently used entries until both caps hold
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def _forget(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.revalidations
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "revalidations": self.revalidations,
+            "not_modified": self.not_modified,
+            "parse_skips": self.parse_skips,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "db_path": self.db_path or None,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+PAGE_CACHE = PageCache(CACHE_TTL, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_DB_PATH)
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP):
+    """Open the connection pool when the server starts and close it (and the page cache) on shutdown."""
+    _get_http_client()
+    try:
+        yield {}
+    finally:
+        await _close_http_client()
+        PAGE_CACHE.close()
+
 
 # Create a Trello MCP server
 mcp = FastMCP(
     "Amazon Scraper", 
+    lifespan=server_lifespan,
     instructions="""
     # Amazon Scraper Server
     
@@ -17,40 +381,175 @@ mcp = FastMCP(
     For search products, identify the keywords and number of results you want to get from the user input
     
     ## Available Tools
-    - `scrape_product(product_url)` - Scrape a product from Amazon
-    - `search_products(query, max_results)` - Search for products on Amazon
+    - `scrape_product(product_url, format)` - Scrape a product from Amazon
+    - `scrape_products(urls, format)` - Scrape several products from Amazon in one call
+    - `search_products(query, max_results, format)` - Search for products on Amazon
+    - `cache_stats()` - Page cache hit/miss counters
+    - `fetch_metrics()` - Rate limiter state and throttled/retried/captcha request counts
     
     ## When to use what
     - For getting product details: Use `scrape_product(product_url)`
+    - For getting details of several products (e.g. comparing search results): Use `scrape_products(urls)` once instead of many `scrape_product` calls
     - For searching products: Use `search_products(query, max_results)`
     
     ## Notes
     - No API key required
+    - `format` is "markdown" (default) or "json". Use "json" when you need to compare or rank products:
+      price is a number with a currency, rating a float and review count an int
         """
 )
 
-# Constants
-# BASE_URL = "https://api.trello.com/1"
-# API_KEY = os.getenv("TRELLO_API_KEY")
-# API_TOKEN = os.getenv("TRELLO_API_TOKEN")
-BASE_URL = "https://www.amazon.com"
+# Where each product field's section starts, matched on attributes so JS strings in <head> don't count.
+# The product description (#productDescription) sits far down the page and is deliberately left out:
+# with streaming on, the description comes from the feature bullets instead.
+PRODUCT_SECTIONS = {
+    'title': re.compile(r'id=["\']?productTitle\b'),
+    'price': re.compile(r'class=["\'][^"\']*\ba-price-whole\b'),
+    'image': re.compile(r'id=["\']?landingImage\b'),
+    'rating': re.compile(r'class=["\'][^"\']*\ba-icon-alt\b'),
+    'reviews': re.compile(r'id=["\']?acrCustomerReviewText\b'),
+    'availability': re.compile(r'id=["\']?availability\b'),
+    'feature_bullets': re.compile(r'id=["\']?feature-bullets\b'),
+}
+SECTION_MARKER_OVERLAP = 256      # re-scan the end of the previous chunk so a marker split across chunks still matches
 
 # Helper functions
-async def fetch_amazon_page(url: str) -> str:
-    """Helper function to fetch Amazon product page"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-    }
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, timeout=15.0)
+async def fetch_amazon_page(url: str, sections: dict | None = None) -> str:
+    """
+    Helper function to fetch Amazon product page over the shared connection pool, served from the page cache when fresh.
+    If `sections` is given, the body is streamed and the download stops early once all of them have been seen.
+    """
+    entry = await fetch_page_entry(url, sections)
+    return entry.body
+
+async def fetch_page_entry(url: str, sections: dict | None = None) -> CacheEntry:
+    """
+    Like fetch_amazon_page, but returns the cache entry, so callers can reuse `entry.parsed`.
+    An expired entry with an ETag/Last-Modified is revalidated with a conditional GET; on a 304 the
+    stored entry (parsed dict included) is returned as-is.
+    """
+    key = cache_key(url, sections)
+    entry, fresh = PAGE_CACHE.lookup(key)
+    if fresh:
+        return entry
+
+    body, headers = await _fetch_paced(url, sections, entry.validators() if entry is not None else None)
+    if body is None and entry is not None:
+        return PAGE_CACHE.refresh(key, entry)
+
+    return PAGE_CACHE.put(key, body, headers.get('ETag'), headers.get('Last-Modified'))
+
+# Markers of Amazon's robot-check page (served with a 200, so the status code doesn't tell us)
+CAPTCHA_RE = re.compile(r'/errors/validateCaptcha|Type the characters you see in this image|api-services-support@amazon\.com')
+
+class CaptchaError(Exception):
+    pass
+
+LIMITER = ratelimit.HostLimiter(RATE_PER_HOST, RATE_BURST)
+
+def _retry_after(response: httpx.Response) -> float | None:
+    try:
+        return float(response.headers.get('Retry-After', ''))
+    except ValueError:
+        return None
+
+def _rate_limited(detail: str, retry_after: float | None = None) -> str:
+    """One message for every way Amazon throttles us (captcha, cool-down, 429/503), so the agent backs off"""
+    wait = f" Amazon asked to wait {retry_after:.0f}s before the next request." if retry_after else ""
+    return f"Rate limited: {detail}.{wait} Do not retry this call right away."
+
+def _throttled_status(e: httpx.HTTPStatusError) -> str | None:
+    """The rate-limit message for a 429/503 that outlasted the retries; None for other statuses"""
+    if e.response.status_code not in RETRY_STATUSES:
+        return None
+    return _rate_limited(f"Amazon answered HTTP {e.response.status_code} after {MAX_RETRIES} retries",
+                         _retry_after(e.response))
+
+async def _fetch_paced(url: str, sections: dict | None, validators: dict | None = None) -> tuple:
+    """
+    One network fetch under the host's rate limit, retrying 429/503 with backoff.
+    Returns (body, response headers); body is None when `validators` were sent and the server answered 304.
+    A 304 to an unconditional request raises HTTPStatusError like any other unexpected status.
+    """
+    host = urlparse(url).netloc.lower()
+    client = _get_http_client()
+
+    for attempt in range(MAX_RETRIES + 1):
+        await LIMITER.acquire(host)
+        try:
+            if sections and STREAM_BYTE_BUDGET > 0:
+                body, headers = await _fetch_sections(client, url, sections, validators)
+            else:
+                response = await client.get(url, headers=validators)
+                not_modified = response.status_code == 304 and bool(validators)
+                if not not_modified:
+                    response.raise_for_status()
+                body = None if not_modified else response.text
+                headers = response.headers
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in RETRY_STATUSES:
+                raise
+            LIMITER.throttled(host)
+            if attempt == MAX_RETRIES:
+                raise
+            LIMITER.retries += 1
+            await asyncio.sleep(ratelimit.backoff_delay(attempt, BACKOFF_BASE, BACKOFF_MAX, _retry_after(e.response)))
+            continue
+
+        if body is not None and CAPTCHA_RE.search(body):
+            # Retrying now would only earn more captchas; stop sending to this host for a while
+            LIMITER.cool_down(host, CAPTCHA_COOLDOWN)
+            raise CaptchaError(f"Amazon answered with a captcha page; paused requests to {host} for {CAPTCHA_COOLDOWN:.0f}s")
+
+        LIMITER.succeeded(host)
+        return body, headers
+
+async def _fetch_sections(client: httpx.AsyncClient, url: str, sections: dict, validators: dict | None = None) -> tuple:
+    """
+    Stream a page until every section marker has matched (plus a short tail) or the byte budget is spent.
+    Returns (body, response headers), with body None on a 304.
+    The budget and tail count body bytes as received (after Content-Encoding), not decoded characters.
+    """
+    pending = dict(sections)
+    chunks = []
+    received = 0
+    stop_at = STREAM_BYTE_BUDGET
+    carry = ''
+
+    async with client.stream("GET", url, headers=validators) as response:
+        # Check 304 first: httpx's raise_for_status treats every 3xx as an error.
+        # A 304 to a request that sent no validators stays an error: there is no body to reuse.
+        if response.status_code == 304 and validators:
+            return None, response.headers
         response.raise_for_status()
-        return response.text
+
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        async for raw in response.aiter_bytes():
+            received += len(raw)
+            chunk = decoder.decode(raw)
+            chunks.append(chunk)
+
+            if pending:
+                window = carry + chunk
+                for name in [name for name, marker in pending.items() if marker.search(window)]:
+                    del pending[name]
+                carry = window[-SECTION_MARKER_OVERLAP:]
+                if not pending:
+                    stop_at = min(stop_at, received + STREAM_TAIL_BYTES)
+
+            # Leaving the `async with` early closes the response, so the rest of the page is never downloaded
+            if received >= stop_at:
+                break
+        else:
+            chunks.append(decoder.decode(b'', final=True))
+
+    return ''.join(chunks), response.headers
+
+PRICE_CHARS_RE = re.compile(r'[^\d.,]')
+# Either separator: "4.6 out of 5" on amazon.com, "4,6 von 5 Sternen" on amazon.de
+RATING_RE = re.compile(r'(\d+(?:[.,]\d+)?)')
+# Thousands grouped with ",", "." or a (narrow) space: "2,417", "2.417", "2 417"
+REVIEWS_RE = re.compile(r'(\d{1,3}(?:[.,\s]\d{3})+|\d+)')
 
 def clean_price(price_text: str) -> str:
     """Clean and extract price from text"""
@@ -58,133 +557,178 @@ def clean_price(price_text: str) -> str:
         return "Price not available"
     
     # Remove extra whitespace and common price prefixes
-    cleaned = re.sub(r'[^\d.,]', '', price_text.strip())
+    cleaned = PRICE_CHARS_RE.sub('', price_text.strip())
     if cleaned:
         return f"${cleaned}"
     return "Price not available"
 
-def extract_product_data(html_content: str, url: str) -> dict:
+# Extraction plan
+#
+# Each field lists its CSS selectors in priority order plus a post-processor that turns the
+# first matching element into a value. A post-processor returning None means "no usable
+# value here, try the next selector". Selectors are compiled once per parser backend (at
+# import for the default backend), so adding a field costs one compiled lookup per page.
+
+def _text(backend, elem):
+    return backend.text(elem).strip()
+
+def _price(backend, elem):
+    return clean_price(backend.text(elem))
+
+def _price_amount(backend, elem):
+    # The full price as Amazon prints it for screen readers ("$1,019.99", "1.299,00 €"), parsed per marketplace later
+    return backend.text(elem).strip() or None
+
+def _rating(backend, elem):
+    rating_match = RATING_RE.search(backend.text(elem))
+    return f"{rating_match.group(1)} out of 5" if rating_match else None
+
+def _reviews(backend, elem):
+    reviews_match = REVIEWS_RE.search(backend.text(elem))
+    return f"{reviews_match.group(1)} reviews" if reviews_match else None
+
+def _image(backend, elem):
+    img_url = backend.attr(elem, 'src') or backend.attr(elem, 'data-old-hires')
+    if img_url and img_url.startswith('//'):
+        img_url = 'https:' + img_url
+    return img_url or None
+
+def _src(backend, elem):
+    return backend.attr(elem, 'src') or None
+
+def _product_link(backend, elem):
+    product_url = backend.attr(elem, 'href')
+    if product_url and product_url.startswith('/'):
+        product_url = 'https://www.amazon.com' + product_url
+    return product_url or None
+
+
+@dataclass(frozen=True)
+class Field:
+    name: str
+    selectors: tuple
+    extract: Callable
+    default: str
+
+
+class ExtractionPlan:
+    """
+    An ordered list of fields, with each field's selectors compiled once per parser backend.
+    `container` optionally names the repeated element (e.g. one search result) the fields are read from.
+    """
+
+    def __init__(self, fields: list, container: str | None = None):
+        self.fields = fields
+        self.container = container
+        self._compiled = {}
+        self._compiled_container = {}
+
+    def defaults(self) -> dict:
+        return {field.name: field.default for field in self.fields}
+
+    def compile(self, backend) -> list:
+        steps = self._compiled.get(backend.name)
+        if steps is None:
+            steps = [(field, [backend.compile(selector) for selector in field.selectors]) for field in self.fields]
+            self._compiled[backend.name] = steps
+        return steps
+
+    def containers(self, backend, doc) -> list:
+        selector = self._compiled_container.get(backend.name)
+        if selector is None:
+            selector = self._compiled_container[backend.name] = backend.compile(self.container)
+        return backend.select(doc, selector)
+
+    def apply(self, backend, node, into: dict) -> dict:
+        """Fill `into` with every field found under `node`; fields that never match keep their current value."""
+        for field, selectors in self.compile(backend):
+            for selector in selectors:
+                elem = backend.select_one(node, selector)
+                if elem is None:
+                    continue
+                value = field.extract(backend, elem)
+                if value is not None:
+                    into[field.name] = value
+                    break
+        return into
+
+
+PRODUCT_PLAN = ExtractionPlan([
+    Field('name', (
+        '#productTitle',
+        'h1.a-size-large',
+        '.a-size-large.product-title-word-break',
+        'h1[data-automation-id="product-title"]',
+    ), _text, 'Product name not found'),
+    Field('price', (
+        '.a-price-whole',
+        '.a-price .a-offscreen',
+        '.a-price-range .a-price-range-min .a-offscreen',
+        '.a-price .a-price-symbol + span',
+        '[data-a-color="price"] .a-offscreen',
+    ), _price, 'Price not available'),
+    # The typed JSON price: .a-price-whole above drops the cents, the .a-offscreen text keeps them
+    Field('price_amount', (
+        '.a-price .a-offscreen',
+        '.a-price-range .a-price-range-min .a-offscreen',
+        '[data-a-color="price"] .a-offscreen',
+    ), _price_amount, 'Price not available'),
+    Field('image_url', (
+        '#landingImage',
+        '#imgBlkFront',
+        '.a-dynamic-image',
+        '[data-old-hires]',
+    ), _image, 'Image not found'),
+    Field('rating', (
+        '.a-icon-alt',
+        '[data-hook="rating-out-of-text"]',
+        '.a-icon-star-small .a-icon-alt',
+    ), _rating, 'Rating not available'),
+    Field('reviews_count', (
+        '#acrCustomerReviewText',
+        '[data-hook="total-review-count"]',
+        '.a-size-base.s-underline-text',
+    ), _reviews, 'Reviews not available'),
+    Field('availability', (
+        '#availability .a-size-medium',
+        '#availability span',
+        '.a-size-medium.a-color-success',
+    ), _text, 'Availability not found'),
+    Field('description', (
+        '#productDescription p',
+        '#feature-bullets .a-list-item',
+        '.a-expander-content p',
+    ), _text, 'Description not available'),
+])
+
+SEARCH_RESULT_PLAN = ExtractionPlan([
+    Field('name', ('a h2 span',), _text, 'Product name not found'),
+    Field('price', ('.a-price-whole',), _price, 'Price not available'),
+    Field('price_amount', ('.a-price .a-offscreen',), _price_amount, 'Price not available'),
+    Field('image_url', ('img.s-image',), _src, 'Image not found'),
+    Field('rating', ('.a-icon-alt',), _rating, 'Rating not available'),
+    Field('url', ('a',), _product_link, 'URL not found'),
+], container='[data-component-type="s-search-result"]')
+
+# No fields: only the container matters, its items are the page numbers in the pagination strip
+SEARCH_PAGINATION_PLAN = ExtractionPlan([], container='.s-pagination-strip .s-pagination-item')
+
+# Compile both plans for the default backend up front
+PRODUCT_PLAN.compile(parsers.DEFAULT_BACKEND)
+SEARCH_RESULT_PLAN.compile(parsers.DEFAULT_BACKEND)
+SEARCH_PAGINATION_PLAN.compile(parsers.DEFAULT_BACKEND)
+
+def extract_product_data(html_content: str, url: str, backend=None) -> dict:
     """Extract product information from Amazon page HTML"""
-    soup = BeautifulSoup(html_content, 'html.parser')
+    backend = backend or parsers.DEFAULT_BACKEND
+    doc = backend.parse(html_content)
     
     # Initialize product data
-    product_data = {
-        'name': 'Product name not found',
-        'price': 'Price not available',
-        'image_url': 'Image not found',
-        'rating': 'Rating not available',
-        'reviews_count': 'Reviews not available',
-        'availability': 'Availability not found',
-        'description': 'Description not available',
-        'url': url
-    }
+    product_data = PRODUCT_PLAN.defaults()
+    product_data['url'] = url
     
     try:
-        # Extract product name
-        name_selectors = [
-            '#productTitle',
-            'h1.a-size-large',
-            '.a-size-large.product-title-word-break',
-            'h1[data-automation-id="product-title"]'
-        ]
-        
-        for selector in name_selectors:
-            name_elem = soup.select_one(selector)
-            if name_elem:
-                product_data['name'] = name_elem.get_text().strip()
-                break
-        
-        # Extract price
-        price_selectors = [
-            '.a-price-whole',
-            '.a-price .a-offscreen',
-            '.a-price-range .a-price-range-min .a-offscreen',
-            '.a-price .a-price-symbol + span',
-            '[data-a-color="price"] .a-offscreen'
-        ]
-        
-        for selector in price_selectors:
-            price_elem = soup.select_one(selector)
-            if price_elem:
-                product_data['price'] = clean_price(price_elem.get_text())
-                break
-        
-        # Extract image URL
-        image_selectors = [
-            '#landingImage',
-            '#imgBlkFront',
-            '.a-dynamic-image',
-            '[data-old-hires]'
-        ]
-        
-        for selector in image_selectors:
-            img_elem = soup.select_one(selector)
-            if img_elem:
-                img_url = img_elem.get('src') or img_elem.get('data-old-hires')
-                if img_url:
-                    if img_url.startswith('//'):
-                        img_url = 'https:' + img_url
-                    product_data['image_url'] = img_url
-                    break
-        
-        # Extract rating
-        rating_selectors = [
-            '.a-icon-alt',
-            '[data-hook="rating-out-of-text"]',
-            '.a-icon-star-small .a-icon-alt'
-        ]
-        
-        for selector in rating_selectors:
-            rating_elem = soup.select_one(selector)
-            if rating_elem:
-                rating_text = rating_elem.get_text()
-                rating_match = re.search(r'(\d+\.?\d*)', rating_text)
-                if rating_match:
-                    product_data['rating'] = f"{rating_match.group(1)} out of 5"
-                    break
-        
-        # Extract reviews count
-        reviews_selectors = [
-            '#acrCustomerReviewText',
-            '[data-hook="total-review-count"]',
-            '.a-size-base.s-underline-text'
-        ]
-        
-        for selector in reviews_selectors:
-            reviews_elem = soup.select_one(selector)
-            if reviews_elem:
-                reviews_text = reviews_elem.get_text()
-                reviews_match = re.search(r'(\d+(?:,\d+)*)', reviews_text)
-                if reviews_match:
-                    product_data['reviews_count'] = f"{reviews_match.group(1)} reviews"
-                    break
-        
-        # Extract availability
-        availability_selectors = [
-            '#availability .a-size-medium',
-            '#availability span',
-            '.a-size-medium.a-color-success'
-        ]
-        
-        for selector in availability_selectors:
-            avail_elem = soup.select_one(selector)
-            if avail_elem:
-                product_data['availability'] = avail_elem.get_text().strip()
-                break
-        
-        # Extract description
-        desc_selectors = [
-            '#productDescription p',
-            '#feature-bullets .a-list-item',
-            '.a-expander-content p'
-        ]
-        
-        for selector in desc_selectors:
-            desc_elem = soup.select_one(selector)
-            if desc_elem:
-                product_data['description'] = desc_elem.get_text().strip()
-                break
-                
+        PRODUCT_PLAN.apply(backend, doc, product_data)
     except Exception as e:
         product_data['error'] = f"Error parsing product data: {str(e)}"
     
@@ -192,139 +736,345 @@ def extract_product_data(html_content: str, url: str) -> dict:
 
 # Helper functions for search results
 
-def extract_search_results(html_content: str, max_results: int) -> list:
-    """Extract product information from Amazon search results"""
-    soup = BeautifulSoup(html_content, 'html.parser')
+def parse_search_page(html_content: str, backend=None) -> tuple:
+    """Extract every result on one search page, plus the page count shown in its pagination strip (1 if there is none)"""
+    backend = backend or parsers.DEFAULT_BACKEND
+    doc = backend.parse(html_content)
     products = []
     
     # Find product containers
-    product_containers = soup.select('[data-component-type="s-search-result"]')
-    
-    for container in product_containers[:max_results]:
+    for container in SEARCH_RESULT_PLAN.containers(backend, doc):
         try:
-            product = {
-                'name': 'Product name not found',
-                'price': 'Price not available',
-                'image_url': 'Image not found',
-                'rating': 'Rating not available',
-                'url': 'URL not found'
-            }
-            
-            # Extract product name
-            name_elem = container.select_one('a h2 span')
-            if name_elem:
-                product['name'] = name_elem.get_text().strip()
-            
-            # Extract product URL
-            url_elem = container.select_one('a')
-            if url_elem:
-                product_url = url_elem.get('href')
-                if product_url:
-                    if product_url.startswith('/'):
-                        product_url = 'https://www.amazon.com' + product_url
-                    product['url'] = product_url
-            
-            # Extract price
-            price_elem = container.select_one('.a-price-whole')
-            if price_elem:
-                product['price'] = clean_price(price_elem.get_text())
-            
-            # Extract image
-            img_elem = container.select_one('img.s-image')
-            if img_elem:
-                img_url = img_elem.get('src')
-                if img_url:
-                    product['image_url'] = img_url
-            
-            # Extract rating
-            rating_elem = container.select_one('.a-icon-alt')
-            if rating_elem:
-                rating_text = rating_elem.get_text()
-                rating_match = re.search(r'(\d+\.?\d*)', rating_text)
-                if rating_match:
-                    product['rating'] = f"{rating_match.group(1)} out of 5"
-            
+            product = SEARCH_RESULT_PLAN.apply(backend, container, SEARCH_RESULT_PLAN.defaults())
+            product['asin'] = backend.attr(container, 'data-asin') or None
             products.append(product)
-            
         except Exception as e:
             print(f"Error extracting product data: {str(e)}")
     
-    return products
+    page_numbers = [int(label) for item in SEARCH_PAGINATION_PLAN.containers(backend, doc)
+                    if (label := backend.text(item).strip()).isdigit()]
+    
+    return products, max(page_numbers, default=1)
+
+def extract_search_results(html_content: str, max_results: int, backend=None) -> list:
+    """Extract product information from Amazon search results"""
+    products, _ = parse_search_page(html_content, backend)
+    return products[:max_results]
+
+def search_page_url(search_url: str, page: int) -> str:
+    return search_url if page == 1 else f"{search_url}&page={page}"
+
+def _result_id(product: dict) -> str:
+    """Dedup key: the ASIN, else the product link (sponsored slots sometimes have no data-asin)"""
+    return product.get('asin') or product['url']
+
+async def paginated_search(search_url: str, max_results: int, ctx: Context | None = None) -> list:
+    """
+    Collect up to `max_results` distinct results across result pages.
+
+    Page 1 is fetched first because it tells us how many pages exist and how many results a page holds;
+    then only as many further pages as should fill the request are fetched concurrently (capped at
+    SEARCH_MAX_PAGES). Results keep Amazon's ranking order, duplicates (same ASIN on two pages) are
+    dropped, and once the pages received so far cover `max_results` the remaining fetches are cancelled.
+    A `max_results` of 0 or less asks for nothing and returns [] without fetching.
+    """
+    if max_results <= 0:
+        return []
+
+    first_page, page_count = parse_search_page(await fetch_amazon_page(search_url))
+
+    results = []
+    seen = set()
+
+    def take(products: list) -> bool:
+        """Append unseen products; True once we have enough"""
+        for product in products:
+            key = _result_id(product)
+            if key in seen:
+                continue
+            seen.add(key)
+            results.append(product)
+            if len(results) >= max_results:
+                return True
+        return False
+
+    if take(first_page) or not first_page:
+        return results
+
+    per_page = len(first_page)
+    missing = max_results - len(results)
+    # One spare page covers results lost to de-duplication; it gets cancelled if it isn't needed
+    last_page = min(page_count, SEARCH_MAX_PAGES, 1 + math.ceil(missing / per_page) + 1)
+    if last_page < 2:
+        return results
+
+    async def fetch_page(page: int) -> tuple:
+        try:
+            products, _ = parse_search_page(await fetch_amazon_page(search_page_url(search_url, page)))
+        except (httpx.HTTPError, ValueError, CaptchaError, ratelimit.Throttled) as e:
+            # A lost page only shortens the result list; page 1 already succeeded
+            print(f"Error fetching search page {page}: {str(e)}", file=sys.stderr)      # stdout is the MCP stdio stream
+            products = []
+        return page, products
+
+    tasks = [asyncio.create_task(fetch_page(page)) for page in range(2, last_page + 1)]
+    done_pages = {}
+    next_page = 2
+
+    try:
+        for finished in asyncio.as_completed(tasks):
+            page, products = await finished
+            done_pages[page] = products
+
+            # Merge in page order so a fast page 3 can't jump ahead of page 2
+            enough = False
+            while next_page in done_pages and not enough:
+                enough = take(done_pages.pop(next_page))
+                next_page += 1
+
+            if ctx is not None:
+                await ctx.report_progress(min(len(results), max_results), max_results, f"{next_page - 1} of {last_page} result pages merged")
+            if enough:
+                break
+    finally:
+        # Pages we no longer need: stop downloading them
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return results
 
 # Formatting functions
 
+OUTPUT_FORMATS = ("markdown", "json")
+
+# Marketplace host -> currency of the prices shown on it (clean_price always prints "$")
+CURRENCIES = {
+    'amazon.com': 'USD',
+    'amazon.ca': 'CAD',
+    'amazon.co.uk': 'GBP',
+    'amazon.de': 'EUR',
+    'amazon.fr': 'EUR',
+    'amazon.it': 'EUR',
+    'amazon.es': 'EUR',
+    'amazon.in': 'INR',
+    'amazon.co.jp': 'JPY',
+    'amazon.com.au': 'AUD',
+}
+
+# Marketplaces that write prices as "1.299,00 €": "." groups thousands and "," starts the cents
+DECIMAL_COMMA_MARKETPLACES = {'amazon.de', 'amazon.fr', 'amazon.it', 'amazon.es'}
+
 def format_search_results(products: list, query: str) -> str:
     """Format search results for display"""
     if not products:
         return f"No products found for '{query}'"
     
-    result = f"# Search Results for '{query}'\n\n"
+    lines = [f"# Search Results for '{query}'\n"]
     for i, product in enumerate(products):
-        result += f"## {i+1}. {product['name']}\n"
-        result += f"Price: {product['price']}\n"
-        result += f"Rating: {product['rating']}\n"
-        result += f"URL: {product['url']}\n\n"
+        lines.append(f"## {i+1}. {product['name']}")
+        lines.append(f"Price: {product['price']}")
+        lines.append(f"Rating: {product['rating']}")
+        lines.append(f"URL: {product['url']}\n")
     
-    return result
+    return "\n".join(lines) + "\n"
 
 def format_product_details(product: dict) -> str:
     """Format product details for display"""
-    result = f"# {product['name']}\n\n"
-    result += f"Price: {product['price']}\n"
-    result += f"Rating: {product['rating']}\n"
-    result += f"Reviews: {product['reviews_count']}\n"
-    result += f"Availability: {product['availability']}\n"
-    result += f"Description: {product['description']}\n"
-    result += f"URL: {product['url']}\n"
-    
-    return result
+    return "\n".join([
+        f"# {product['name']}\n",
+        f"Price: {product['price']}",
+        f"Rating: {product['rating']}",
+        f"Reviews: {product['reviews_count']}",
+        f"Availability: {product['availability']}",
+        f"Description: {product['description']}",
+        f"URL: {product['url']}",
+    ]) + "\n"
 
-# Tools
+LOCAL_NUMBER_RE = re.compile(r'(\d[\d.,]*)')
 
-@mcp.tool()
-async def scrape_product(product_url: str) -> str:
-    """Scrape product information from an Amazon product URL"""
+def _local_number(text: str | None, marketplace: str, cast=float):
+    """
+    The first number in a display string, read with the marketplace's separators: "$1,019.99",
+    "4.6 out of 5" and "2,417 reviews" on amazon.com, "1.299,00 €", "4,6 out of 5" and
+    "2.417 reviews" on amazon.de. None if there isn't one.
+    """
+    if not text:
+        return None
+    match = LOCAL_NUMBER_RE.search(re.sub(r'\s', '', text))      # amazon.fr groups thousands with a (narrow) space
+    if not match:
+        return None
+    digits = match.group(1)
+    if marketplace in DECIMAL_COMMA_MARKETPLACES:
+        digits = digits.replace('.', '').replace(',', '.')
+    else:
+        digits = digits.replace(',', '')
+    try:
+        return cast(digits.rstrip('.'))
+    except ValueError:
+        return None
+
+def _typed_fields(plan: ExtractionPlan, product: dict) -> dict:
+    """Swap the plan's "... not found" placeholders for None"""
+    defaults = plan.defaults()
+    return {key: None if defaults.get(key) == value else value for key, value in product.items()}
+
+def _marketplace(url: str | None) -> str:
+    return urlparse(url or BASE_URL).netloc.lower().removeprefix('www.') or 'amazon.com'
+
+def product_record(product: dict) -> dict:
+    """Compact typed record of a scraped product: price as a number plus currency, rating float, review count int"""
+    fields = _typed_fields(PRODUCT_PLAN, product)
+    marketplace = _marketplace(product['url'])
+    asin_match = ASIN_RE.search(urlparse(product['url']).path)
+    return {
+        'asin': asin_match.group(1).upper() if asin_match else None,
+        'name': fields['name'],
+        'price': _local_number(fields.get('price_amount') or fields['price'], marketplace),
+        'currency': CURRENCIES.get(marketplace, 'USD'),
+        'rating': _local_number(fields['rating'], marketplace),
+        'reviews': _local_number(fields['reviews_count'], marketplace, int),
+        'availability': fields['availability'],
+        'description': fields['description'],
+        'url': product['url'],
+    }
+
+def search_result_record(product: dict, search_url: str) -> dict:
+    """Compact typed record of one search result"""
+    fields = _typed_fields(SEARCH_RESULT_PLAN, product)
+    marketplace = _marketplace(search_url)
+    asin_match = ASIN_RE.search(urlparse(fields['url'] or '').path)
+    return {
+        'asin': product.get('asin') or (asin_match.group(1).upper() if asin_match else None),
+        'name': fields['name'],
+        'price': _local_number(fields.get('price_amount') or fields['price'], marketplace),
+        'currency': CURRENCIES.get(marketplace, 'USD'),
+        'rating': _local_number(fields['rating'], marketplace),
+        'url': fields['url'],
+    }
+
+def to_json(data) -> str:
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+def _format_error(format: str) -> str | None:
+    if format not in OUTPUT_FORMATS:
+        return f"Error: format must be one of {', '.join(OUTPUT_FORMATS)}"
+    return None
+
+async def _scrape_one(product_url: str) -> dict:
+    """Fetch and parse one product page; a failure comes back as {'url', 'error'} instead of raising"""
     try:
         # Validate URL
         parsed_url = urlparse(product_url)
         if 'amazon' not in parsed_url.netloc.lower():
-            return "Error: Please provide a valid Amazon product URL"
+            return {'url': product_url, 'error': "Error: Please provide a valid Amazon product URL"}
         
-        # Fetch the page
-        html_content = await fetch_amazon_page(product_url)
+        # Fetch the page (only as far as the sections we extract)
+        entry = await fetch_page_entry(product_url, sections=PRODUCT_SECTIONS)
         
-        # Extract product data
-        product_data = extract_product_data(html_content, product_url)
+        # Unchanged page (fresh hit or 304): reuse the dict parsed last time
+        if entry.parsed is not None:
+            PAGE_CACHE.parse_skips += 1
+            return {**entry.parsed, 'url': product_url}
         
-        # Format the result
-        return format_product_details(product_data)
+        # Extract product data
+        product_data = extract_product_data(entry.body, product_url)
+        if 'error' not in product_data:
+            PAGE_CACHE.set_parsed(cache_key(product_url, PRODUCT_SECTIONS), entry, product_data)
+        return product_data
         
     except httpx.HTTPStatusError as e:
-        return f"HTTP Error: {e.response.status_code} - {e.response.reason_phrase}"
+        return {'url': product_url, 'error': _throttled_status(e) or f"HTTP Error: {e.response.status_code} - {e.response.reason_phrase}"}
     except httpx.RequestError as e:
-        return f"Request Error: {str(e)}"
+        return {'url': product_url, 'error': f"Request Error: {str(e)}"}
+    except (CaptchaError, ratelimit.Throttled) as e:
+        return {'url': product_url, 'error': _rate_limited(str(e))}
     except Exception as e:
-        return f"Error scraping product: {str(e)}"
+        return {'url': product_url, 'error': f"Error scraping product: {str(e)}"}
+
+def _render_product(result: dict, format: str):
+    """Markdown text, or a typed record for JSON; failed scrapes keep their error either way"""
+    failed = 'name' not in result
+    if format == "json":
+        return result if failed else product_record(result)
+    return result['error'] if failed else format_product_details(result)
+
+# Tools
 
 @mcp.tool()
-async def search_products(query: str, max_results: int = 5) -> str:
-    """Search for products on Amazon and return results"""
+async def scrape_product(product_url: str, format: str = "markdown") -> str:
+    """Scrape product information from an Amazon product URL. format="json" returns a compact typed record"""
+    if error := _format_error(format):
+        return error
+
+    rendered = _render_product(await _scrape_one(product_url), format)
+    return to_json(rendered) if format == "json" else rendered
+
+@mcp.tool()
+async def scrape_products(urls: list[str], format: str = "markdown") -> str:
+    """Scrape several Amazon product URLs concurrently. Results keep the input order; a failed URL reports its own error without failing the batch. format="json" returns a list of typed records"""
+    if error := _format_error(format):
+        return error
+    if not urls:
+        return "Error: Please provide at least one Amazon product URL"
+
+    batch = urls[:MAX_BATCH_URLS]
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def scrape_bounded(product_url: str) -> dict:
+        async with semaphore:
+            return await _scrape_one(product_url)
+
+    # gather() keeps input order; _scrape_one turns every failure into an error result, so one bad URL can't sink the rest
+    results = await asyncio.gather(*(scrape_bounded(url) for url in batch))
+
+    if format == "json":
+        return to_json({
+            'products': [_render_product(result, format) for result in results],
+            'skipped_urls': urls[len(batch):],
+        })
+
+    sections = [f"## Product {i+1} of {len(batch)} ({url})\n{_render_product(result, format)}" for i, (url, result) in enumerate(zip(batch, results))]
+    if len(urls) > len(batch):
+        sections.append(f"Note: only the first {len(batch)} of {len(urls)} URLs were scraped")
+
+    return "\n---\n".join(sections)
+
+@mcp.tool()
+async def search_products(query: str, max_results: int = 5, format: str = "markdown", ctx: Context = None) -> str:
+    """Search for products on Amazon and return results, reading further result pages when max_results needs them. format="json" returns compact typed records"""
+    if error := _format_error(format):
+        return error
+
     try:
         # Construct search URL
         search_url = f"https://www.amazon.com/s?k={query.replace(' ', '+')}"
         
-        # Fetch search results page
-        html_content = await fetch_amazon_page(search_url)
-        
-        # Extract search results
-        products = extract_search_results(html_content, max_results)
+        # Fetch and extract as many result pages as max_results needs
+        products = await paginated_search(search_url, max_results, ctx)
         
         # Format the results
+        if format == "json":
+            return to_json({'query': query, 'results': [search_result_record(p, search_url) for p in products]})
         return format_search_results(products, query)
         
+    except (CaptchaError, ratelimit.Throttled) as e:
+        return _rate_limited(str(e))
+    except httpx.HTTPStatusError as e:
+        return _throttled_status(e) or f"Error searching products: {str(e)}"
     except Exception as e:
         return f"Error searching products: {str(e)}"
 
+@mcp.tool()
+def cache_stats() -> Dict[str, Any]:
+    """Return page cache hit/miss counters, hit rate and current size"""
+    return PAGE_CACHE.stats()
+
+@mcp.tool()
+def fetch_metrics() -> Dict[str, Any]:
+    """Return rate limiter state per host and counts of delayed, throttled, retried and captcha-blocked requests"""
+    return LIMITER.stats()
+
 
 if __name__ == "__main__":
     print("Starting Amazon Products MCP server...")
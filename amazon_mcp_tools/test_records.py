@@ -0,0 +1,67 @@
+# Typed JSON records built from the saved pages in fixtures/.
+#
+# Run:
+#   python -m pytest test_records.py
+
+import os
+
+import pytest
+
+import server
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_product_price_keeps_the_cents():
+    url = "https://www.amazon.com/dp/B0CMDRCZBJ"
+    record = server.product_record(server.extract_product_data(fixture("product_phone.html"), url))
+    assert record["price"] == 1019.99
+    assert record["currency"] == "USD"
+    assert record["rating"] == 4.4
+    assert record["reviews"] == 3214
+
+
+def test_product_price_uses_decimal_comma_on_eu_marketplaces():
+    url = "https://www.amazon.de/dp/B0KETTLE01"
+    product = server.extract_product_data(fixture("product_kettle_de.html"), url)
+    record = server.product_record(product)
+    assert record["price"] == 1299.0
+    assert record["currency"] == "EUR"
+    assert record["rating"] == 4.6
+    assert record["reviews"] == 2417
+    assert product["rating"] == "4,6 out of 5"
+    assert product["reviews_count"] == "2.417 reviews"
+
+
+def test_search_result_prices_keep_the_cents():
+    products = server.extract_search_results(fixture("search_phones.html"), 100)
+    records = [server.search_result_record(p, "https://www.amazon.com/s?k=phones") for p in products]
+    assert records[0]["price"] == 199.99
+
+
+@pytest.mark.parametrize("text, marketplace, expected", [
+    ("$1,019.99", "amazon.com", 1019.99),
+    ("£12.50", "amazon.co.uk", 12.5),
+    ("1.299,00 €", "amazon.de", 1299.0),
+    ("1 299,00 €", "amazon.fr", 1299.0),
+    ("12,99 €", "amazon.it", 12.99),
+    ("₹1,24,999.00", "amazon.in", 124999.0),
+    ("Price not available", "amazon.com", None),
+])
+def test_price_number(text, marketplace, expected):
+    assert server._local_number(text, marketplace) == expected
+
+
+@pytest.mark.parametrize("text, marketplace, expected", [
+    ("2,417 reviews", "amazon.com", 2417),
+    ("2.417 Sternebewertungen", "amazon.de", 2417),
+    ("2 417 évaluations", "amazon.fr", 2417),
+    ("38 reviews", "amazon.de", 38),
+])
+def test_review_count(text, marketplace, expected):
+    assert server._local_number(text, marketplace, int) == expected
@@ -1,8 +1,7 @@
-import aisuite as ai
-CLIENT = ai.Client()
+from agent_core.llm import chat
 
 
-def planner_claude(query, tool_defs, model: str = "anthropic:claude-haiku-4-5") -> str: 
+async def planner_claude(query, tool_defs, model: str = "anthropic:claude-haiku-4-5") -> str: 
     
     ### START CODE HERE ###
 
@@ -26,7 +25,7 @@ def planner_claude(query, tool_defs, model: str = "anthropic:claude-haiku-4-5")
     ### END CODE HERE ###
     
     # Get a response from the LLM by creating a chat with the client.
-    response = CLIENT.chat.completions.create(
+    response = await chat(
         model=model,
         messages=[
 
@@ -35,6 +34,7 @@ def planner_claude(query, tool_defs, model: str = "anthropic:claude-haiku-4-5")
             ],
         tools = tool_defs,
         temperature=1.0,
+        cache=False,
     )
 
     return response.choices[0].message.content
@@ -42,7 +42,7 @@ def planner_claude(query, tool_defs, model: str = "anthropic:claude-haiku-4-5")
 # ollama:gemma3:latest
 # ollama:qwen3:4b
 
-def planner_ollama(query, tool_defs, model: str = "ollama:gemma3:latest") -> str:
+async def planner_ollama(query, tool_defs, model: str = "ollama:gemma3:latest") -> str:
     """
     Use a local Ollama model as a planner.
     It will *not* actually call tools, it only reasons about them in text.
@@ -85,7 +85,7 @@ def planner_ollama(query, tool_defs, model: str = "ollama:gemma3:latest") -> str
     - Do NOT add extra commentary; just the steps.
     """
 
-    response = CLIENT.chat.completions.create(
+    response = await chat(
         model=model,
         messages=[
             {"role": "system", "content": "You are a meticulous shopping assistant and planner."},
@@ -0,0 +1,167 @@
+# bench_list.py
+# -------------
+# gmail_list latency against a local stub of the Gmail API: the old one-request-per-message
+# loop vs. the batched metadata fetch in gmail_server.py, and a repeated search answered
+# from the local message store.
+#
+# Run:
+#   python bench_list.py --messages 10 100 500 --rtt-ms 40
+#
+# --rtt-ms is added to every HTTP request the stub answers, batch or not, to stand in for
+# the round trip to gmail.googleapis.com.
+
+import argparse
+import json
+import os
+import re
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+# The store is measured separately below, in a temporary file
+os.environ["GMAIL_STORE_DB"] = ""
+
+import gmail_server
+from message_store import MessageStore
+
+
+def stub_message(message_id: str) -> dict:
+    n = int(message_id.removeprefix("m"))
+    return {
+        "id": message_id,
+        "threadId": f"t{n}",
+        "labelIds": ["INBOX", "UNREAD"] if n % 3 == 0 else ["INBOX"],
+        "snippet": f"Your statement for account ending {n:04d} is ready to view",
+        "payload": {"headers": [
+            {"name": "From", "value": "Kotak Bank <alerts@kotak.com>"},
+            {"name": "To", "value": "me@example.com"},
+            {"name": "Subject", "value": f"Statement #{n}"},
+            {"name": "Date", "value": "Mon, 13 Oct 2025 09:00:00 +0530"},
+        ]},
+    }
+
+
+class StubGmailHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    rtt = 0.0
+    mailbox = 1000      # messages the stub's search matches, paged like the real API
+
+    def _send(self, status: int, content_type: str, body: bytes) -> None:
+        time.sleep(self.rtt)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/gmail/v1/users/me/messages":
+            params = parse_qs(url.query)
+            start = int(params.get("pageToken", ["0"])[0])
+            end = min(self.mailbox, start + min(500, int(params.get("maxResults", ["100"])[0])))
+            body = {"messages": [{"id": f"m{i}", "threadId": f"t{i}"} for i in range(start, end)], "resultSizeEstimate": self.mailbox}
+            if end < self.mailbox:
+                body["nextPageToken"] = str(end)
+        elif url.path in ("/gmail/v1/users/me/profile", "/gmail/v1/users/me/history"):
+            body = {"historyId": "1000"}     # a mailbox that never changes
+        else:
+            body = stub_message(unquote(url.path.rsplit("/", 1)[1]))
+        self._send(200, "application/json", json.dumps(body).encode("utf-8"))
+
+    def do_POST(self):
+        # A batch: multipart/mixed, one "GET /gmail/v1/users/me/messages/<id>?..." per part
+        request = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+        parts = re.findall(r"Content-ID: <([^>]+)>.*?GET /gmail/v1/users/me/messages/([^?\s]+)", request, re.S)
+        boundary = "batch_stub_boundary"
+        chunks = []
+        for content_id, message_id in parts:
+            payload = json.dumps(stub_message(unquote(message_id)))
+            chunks.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 200 OK\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n{payload}\r\n"
+            )
+        chunks.append(f"--{boundary}--\r\n")
+        self._send(200, f"multipart/mixed; boundary={boundary}", "".join(chunks).encode("utf-8"))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(rtt: float) -> ThreadingHTTPServer:
+    StubGmailHandler.rtt = rtt
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubGmailHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def stub_service(port: int):
+    """The real Gmail client, built from the bundled discovery document but pointed at the stub."""
+    doc = json.loads(get_static_doc("gmail", "v1"))
+    doc["rootUrl"] = f"http://127.0.0.1:{port}/"
+    return build_from_document(doc, http=httplib2.Http())
+
+
+def list_serial(svc, max_results: int) -> list:
+    """The pre-batch behaviour: one messages.get round trip per listed message."""
+    ids = svc.users().messages().list(userId="me", q="", maxResults=max_results).execute().get("messages", [])
+    return [
+        gmail_server._message_card(svc.users().messages().get(
+            userId="me", id=m["id"], format="metadata", metadataHeaders=list(gmail_server.HEADER_WANTED)).execute())
+        for m in ids
+    ]
+
+
+def timed(fn, runs: int) -> list:
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gmail_list: serial messages.get vs. batched")
+    parser.add_argument("--messages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--rtt-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    httpd = start_stub_server(args.rtt_ms / 1000)
+    svc = stub_service(httpd.server_address[1])
+    gmail_server._gmail_service = lambda: svc
+    tmp = tempfile.TemporaryDirectory()
+
+    try:
+        print(f"rtt={args.rtt_ms:.0f} ms, batch size {gmail_server.BATCH_SIZE}")
+        for n in args.messages:
+            gmail_server.STORE = None
+            serial = timed(lambda: list_serial(svc, n), args.runs)
+            batched = timed(lambda: gmail_server.gmail_list(max_results=n), args.runs)
+            assert len(gmail_server.gmail_list(max_results=n)["messages"]) == n
+
+            # Same search again with the local store: the first run fills it, the rest are answered from it
+            gmail_server.STORE = MessageStore(os.path.join(tmp.name, f"store_{n}.db"), gmail_server.STORE_QUERY_TTL)
+            gmail_server._last_sync = float("-inf")
+            gmail_server.gmail_list(max_results=n)
+            stored = timed(lambda: gmail_server.gmail_list(max_results=n), args.runs)
+            gmail_server.STORE.close()
+
+            print(f"{n:>5} messages   serial {statistics.median(serial):9.1f} ms   "
+                  f"batched {statistics.median(batched):8.1f} ms   ({statistics.median(serial) / statistics.median(batched):.0f}x)   "
+                  f"repeat from store {statistics.median(stored):6.2f} ms")
+    finally:
+        httpd.shutdown()
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
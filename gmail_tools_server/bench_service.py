@@ -0,0 +1,71 @@
+# bench_service.py
+# ----------------
+# What a Gmail tool call pays before its first API request: the old _gmail_service()
+# (read token.json, build the discovery client) vs. the cached one in gmail_server.py.
+#
+# Run:
+#   python bench_service.py --calls 50
+#
+# Uses a throwaway token file with a far-off expiry, so nothing is refreshed and no
+# network is touched; building the client reads the bundled discovery document.
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+import gmail_server
+
+
+def write_token(path: str) -> None:
+    with open(path, "w") as f:
+        json.dump({
+            "token": "stub-access-token",
+            "refresh_token": "stub-refresh-token",
+            "client_id": "stub.apps.googleusercontent.com",
+            "client_secret": "stub",
+            "scopes": gmail_server.SCOPES,
+            "expiry": (datetime.now(timezone.utc) + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }, f)
+
+
+def uncached_service():
+    """The pre-cache behaviour: re-read the token and rebuild the client on every tool call."""
+    creds = Credentials.from_authorized_user_file(gmail_server.TOKEN_PATH, gmail_server.SCOPES)
+    return build("gmail", "v1", credentials=creds, cache_discovery=False)
+
+
+def timed(fn, calls: int) -> list:
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="_gmail_service(): rebuilt per call vs. cached")
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gmail_server.TOKEN_PATH = os.path.join(tmp, "token.json")
+        write_token(gmail_server.TOKEN_PATH)
+
+        uncached = timed(uncached_service, args.calls)
+        cached = timed(gmail_server._gmail_service, args.calls)
+
+    print(f"uncached  p50={statistics.median(uncached):8.2f} ms   mean={statistics.mean(uncached):8.2f} ms")
+    print(f"cached    p50={statistics.median(cached):8.3f} ms   first call={cached[0]:8.2f} ms")
+    print(json.dumps(gmail_server._service_stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,12 @@
 # Optional:
 #   GMAIL_TOKEN_PATH=./token.json       (default: ./token.json)
 #   GMAIL_SCOPES=gmail.readonly         (comma-separated; default: "gmail.readonly")
+#   GMAIL_BATCH_SIZE=50                 (messages fetched per batch HTTP request; the API allows 100)
+#   GMAIL_TOKEN_REFRESH_MARGIN=300      (refresh the access token this many seconds before it expires)
+#   GMAIL_HTTP_TIMEOUT=60               (seconds, per Gmail API request)
+#   GMAIL_STORE_DB=gmail_store.db       (local copy of fetched messages, bodies in plain text; off unless set)
+#   GMAIL_STORE_SYNC_INTERVAL=30        (seconds between users.history.list syncs of the local copy)
+#   GMAIL_STORE_QUERY_TTL=600           (seconds a repeated gmail_list search is answered locally)
 #
 # Run:
 #   python gmail_server.py
@@ -35,8 +41,13 @@ import os
 import json
 import base64
 import re
+import sys
+import threading
+import time
 from typing import Dict, Any, List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+
+import httplib2
 
 from mcp.server.fastmcp import FastMCP
 
@@ -44,16 +55,31 @@ from mcp.server.fastmcp import FastMCP
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from dotenv import load_dotenv
 load_dotenv()
 
+from message_store import MessageStore
+
 
 # ---------- Config ----------
 CLIENT_ID = os.getenv("GMAIL_CLIENT_ID", "")
 CLIENT_SECRET = os.getenv("GMAIL_CLIENT_SECRET", "")
 TOKEN_PATH = os.getenv("GMAIL_TOKEN_PATH", "token.json")
 SCOPES = [s.strip() for s in os.getenv("GMAIL_SCOPES", "https://www.googleapis.com/auth/gmail.readonly").split(",")]
+# Gmail takes up to 100 calls per batch, but recommends 50: bigger batches get rate limited
+GMAIL_BATCH_LIMIT = 100
+BATCH_SIZE = max(1, min(GMAIL_BATCH_LIMIT, int(os.getenv("GMAIL_BATCH_SIZE", "50"))))
+# messages.list returns at most 500 ids per page; gmail_list_page keeps its pages small for the LLM
+GMAIL_LIST_PAGE_LIMIT = 500
+MAX_CURSOR_PAGE = 100
+TOKEN_REFRESH_MARGIN = timedelta(seconds=int(os.getenv("GMAIL_TOKEN_REFRESH_MARGIN", "300")))
+HTTP_TIMEOUT = float(os.getenv("GMAIL_HTTP_TIMEOUT", "60"))
+STORE_PATH = os.getenv("GMAIL_STORE_DB", "")
+STORE_SYNC_INTERVAL = float(os.getenv("GMAIL_STORE_SYNC_INTERVAL", "30"))
+STORE_QUERY_TTL = float(os.getenv("GMAIL_STORE_QUERY_TTL", "600"))
 
 # print(CLIENT_ID)
 # print(CLIENT_SECRET)
@@ -65,23 +91,48 @@ if not CLIENT_ID or not CLIENT_SECRET:
     print("[Gmail MCP] WARNING: GMAIL_CLIENT_ID / GMAIL_CLIENT_SECRET not set. OAuth will fail until provided.")
 
 # ---------- OAuth Helpers ----------
-def _credentials() -> Credentials:
+# One credentials object and one Gmail client for the whole process. The client is built
+# once (parsing the discovery document is the slow part) on an httplib2 transport that keeps
+# its connection to gmail.googleapis.com open; the credentials are refreshed in place, so the
+# client keeps working across token refreshes.
+_creds: Optional[Credentials] = None
+_service = None
+_service_lock = threading.Lock()
+SERVICE_TIMINGS = {"calls": 0, "builds": 0, "refreshes": 0, "total_ms": 0.0, "build_ms": 0.0}
+
+def _needs_refresh(creds: Credentials) -> bool:
+    if creds.expiry is None:
+        return not creds.valid
+    # google-auth keeps expiry as naive UTC
+    return creds.expiry - datetime.now(timezone.utc).replace(tzinfo=None) < TOKEN_REFRESH_MARGIN
+
+def _credentials(interactive: bool = True) -> Credentials:
     """
     Return a valid Credentials object. Will run a local OAuth flow on first run.
-    Stores/refreshes the token at TOKEN_PATH.
+    Stores/refreshes the token at TOKEN_PATH. Reads the token file only once per process.
+    With interactive=False, raises instead of opening the browser consent flow.
     """
-    creds = None
-    if os.path.exists(TOKEN_PATH):
+    global _creds
+    creds = _creds
+    if creds and creds.valid and not _needs_refresh(creds):
+        return creds
+
+    if creds is None and os.path.exists(TOKEN_PATH):
         creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
 
-    if creds and creds.expired and creds.refresh_token:
+    if creds and creds.refresh_token and _needs_refresh(creds):
         try:
             creds.refresh(Request())
+            SERVICE_TIMINGS["refreshes"] += 1
+            with open(TOKEN_PATH, "w") as f:
+                f.write(creds.to_json())
         except Exception as e:
             print(f"[Gmail MCP] Token refresh failed: {e}")
             creds = None
 
     if not creds or not creds.valid:
+        if not interactive:
+            raise RuntimeError("no valid Gmail token, and getting one needs the browser consent flow")
         client_config = {
             "installed": {
                 "client_id": CLIENT_ID,
@@ -98,11 +149,45 @@ def _credentials() -> Credentials:
             f.write(creds.to_json())
         print(f"[Gmail MCP] Saved token to {TOKEN_PATH}")
 
+    if _creds is not None and creds is not _creds:
+        # A brand-new credentials object (new consent): the cached client holds the old one
+        _reset_service()
+    _creds = creds
     return creds
 
-def _gmail_service():
-    creds = _credentials()
-    return build("gmail", "v1", credentials=creds, cache_discovery=False)
+def _reset_service() -> None:
+    global _service
+    _service = None
+
+def _gmail_service(interactive: bool = True):
+    start = time.perf_counter()
+    with _service_lock:
+        creds = _credentials(interactive)
+        if _service is None:
+            _build_service(creds)
+        svc = _service
+    SERVICE_TIMINGS["calls"] += 1
+    SERVICE_TIMINGS["total_ms"] += (time.perf_counter() - start) * 1000
+    return svc
+
+def _build_service(creds: Credentials) -> None:
+    global _service
+    start = time.perf_counter()
+    http = AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+    _service = build("gmail", "v1", http=http, cache_discovery=False)
+    SERVICE_TIMINGS["builds"] += 1
+    SERVICE_TIMINGS["build_ms"] += (time.perf_counter() - start) * 1000
+
+def _service_stats() -> Dict[str, Any]:
+    t = SERVICE_TIMINGS
+    reused = t["calls"] - t["builds"]
+    return {
+        "calls": t["calls"],
+        "builds": t["builds"],
+        "token_refreshes": t["refreshes"],
+        "build_ms_avg": round(t["build_ms"] / t["builds"], 2) if t["builds"] else None,
+        "cached_call_ms_avg": round((t["total_ms"] - t["build_ms"]) / reused, 3) if reused > 0 else None,
+    }
 
 # ---------- Email helpers ----------
 HEADER_WANTED = {"From", "To", "Subject", "Date"}
@@ -147,6 +232,178 @@ def _decode_body(payload: Dict[str, Any]) -> str:
                 return _html_to_text(html)
     return ""
 
+def _message_card(msg: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": msg["id"],
+        "threadId": msg.get("threadId"),
+        "headers": _pluck_headers(msg.get("payload", {}).get("headers", [])),
+        "snippet": msg.get("snippet", "") or "",
+    }
+
+def _get_metadata(svc, message_ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    Metadata of many messages in as few round trips as possible: stored messages come from
+    the local store, the rest from one batch HTTP request per BATCH_SIZE ids. A call that
+    fails inside its batch (usually a per-call 429) is retried on its own once; if that
+    fails too, its card carries the error.
+    """
+    def get(message_id: str):
+        return svc.users().messages().get(userId="me", id=message_id, format="metadata", metadataHeaders=list(HEADER_WANTED))
+
+    stored = STORE.cards(message_ids) if STORE is not None else {}
+    missing = [message_id for message_id in dict.fromkeys(message_ids) if message_id not in stored]
+    found: Dict[str, Dict[str, Any]] = {}
+    failed: List[str] = []
+
+    def collect(request_id, response, exception):
+        if exception is None:
+            found[request_id] = response
+        else:
+            failed.append(request_id)
+
+    for start in range(0, len(missing), BATCH_SIZE):
+        batch = svc.new_batch_http_request(callback=collect)
+        for message_id in missing[start:start + BATCH_SIZE]:
+            batch.add(get(message_id), request_id=message_id)
+        batch.execute()
+
+    for message_id in failed:
+        try:
+            found[message_id] = get(message_id).execute()
+        except Exception as e:
+            stored[message_id] = {"id": message_id, "error": f"Could not fetch message: {e}"}
+
+    for message_id, msg in found.items():
+        card = stored[message_id] = _message_card(msg)
+        if STORE is not None:
+            STORE.put_message(msg, card["headers"])
+
+    return [stored[message_id] for message_id in message_ids]
+
+# ---------- Local store ----------
+STORE = MessageStore(STORE_PATH, STORE_QUERY_TTL) if STORE_PATH else None
+_last_sync = float("-inf")
+
+def _sync_store(svc) -> bool:
+    """
+    Bring the store up to date, at most once per STORE_SYNC_INTERVAL. Never raises: if the sync
+    fails (API error, network down, timeout) the remembered searches are dropped, so gmail_list
+    goes to the API instead of answering from a store that may be behind, and the next call
+    tries again. Returns whether the store is in sync.
+    """
+    global _last_sync
+    if STORE is None:
+        return False
+    if time.monotonic() - _last_sync < STORE_SYNC_INTERVAL:
+        return True
+
+    try:
+        _apply_history(svc)
+    except Exception as e:
+        print(f"[Gmail MCP] Store sync failed, searches go to the API until it succeeds: {e!r}", file=sys.stderr)
+        STORE.forget_queries()
+        return False
+    _last_sync = time.monotonic()
+    return True
+
+def _apply_history(svc) -> None:
+    """
+    Apply the mailbox changes since the store's historyId (users.history.list): drop deleted
+    messages, update labels, add new messages, forget remembered searches. A history gap
+    (historyId too old) starts the store over.
+    """
+    start_id = STORE.get_meta("history_id")
+    if start_id is None:
+        STORE.reset(svc.users().getProfile(userId="me").execute()["historyId"])
+        return
+
+    added: List[str] = []
+    deleted: List[str] = []
+    changed = 0
+    page_token = None
+    try:
+        while True:
+            kwargs = {"userId": "me", "startHistoryId": start_id,
+                      "historyTypes": ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"]}
+            if page_token:
+                kwargs["pageToken"] = page_token
+            result = svc.users().history().list(**kwargs).execute()
+            for record in result.get("history", []) or []:
+                changed += 1
+                added += [item["message"]["id"] for item in record.get("messagesAdded", [])]
+                deleted += [item["message"]["id"] for item in record.get("messagesDeleted", [])]
+                for item in record.get("labelsAdded", []):
+                    STORE.change_labels(item["message"]["id"], added=item.get("labelIds", []))
+                for item in record.get("labelsRemoved", []):
+                    STORE.change_labels(item["message"]["id"], removed=item.get("labelIds", []))
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                break
+    except HttpError as e:
+        if e.resp.status != 404:
+            raise
+        # Gmail keeps about a week of history; past that we can't tell what changed
+        STORE.reset(svc.users().getProfile(userId="me").execute()["historyId"])
+        return
+
+    if changed:
+        STORE.history_changes += changed
+        STORE.forget_queries()
+        STORE.delete(deleted)
+        gone = set(deleted)
+        new_ids = [message_id for message_id in dict.fromkeys(added) if message_id not in gone]
+        if new_ids:
+            _get_metadata(svc, new_ids)
+    STORE.set_meta(history_id=result.get("historyId", start_id), synced_at=time.time())
+
+def _sync_store_if_online() -> bool:
+    """
+    _sync_store for the tools that work offline: skipped, rather than prompting, when there is
+    no usable token, and never raises. Returns whether the store is in sync.
+    """
+    try:
+        svc = _gmail_service(interactive=False)
+    except Exception as e:
+        print(f"[Gmail MCP] Store not synced: {e!r}", file=sys.stderr)
+        return False
+    return _sync_store(svc)
+
+def _list_pages(svc, query: str, limit: int, page_size: int, page_token: Optional[str] = None):
+    """
+    Yield (cards, next_page_token) one messages.list page at a time, following nextPageToken
+    until `limit` messages have been yielded or the mailbox runs out. Only one page of
+    cards is held at a time.
+    """
+    remaining = limit
+    while remaining > 0:
+        kwargs = {"userId": "me", "q": query, "maxResults": min(page_size, remaining, GMAIL_LIST_PAGE_LIMIT)}
+        if page_token:
+            kwargs["pageToken"] = page_token
+        result = svc.users().messages().list(**kwargs).execute()
+        ids = [m["id"] for m in result.get("messages", []) or []]
+        page_token = result.get("nextPageToken")
+        cards = _get_metadata(svc, ids)
+        remaining -= len(cards)
+        yield cards, page_token
+        if not page_token or not ids:
+            return
+
+def _encode_cursor(query: str, page_size: int, page_token: str) -> str:
+    blob = json.dumps({"q": query, "n": page_size, "t": page_token}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(blob.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> tuple:
+    """(query, page_size, page_token) from a cursor _encode_cursor made; ValueError if it is not one."""
+    state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    if not isinstance(state, dict):
+        raise ValueError("cursor is not an object")
+    query, page_size, page_token = state.get("q"), state.get("n"), state.get("t")
+    if not isinstance(query, str) or not isinstance(page_token, str) or not page_token:
+        raise ValueError("cursor query or page token is missing")
+    if not isinstance(page_size, int) or isinstance(page_size, bool) or page_size < 1:
+        raise ValueError("cursor page size is not a positive integer")
+    return query, page_size, page_token
+
 def _html_to_text(html: str) -> str:
     # Very basic HTML to text (enough for summaries)
     text = re.sub(r"(?is)<(script|style).*?>.*?</\1>", "", html)
@@ -183,7 +440,7 @@ def gmail_auth_status() -> Dict[str, Any]:
     except Exception as e:
         ok = False
         msg = f"Gmail OAuth not ready: {e}"
-    return {"ok": ok, "message": msg, "token_path": TOKEN_PATH, "scopes": SCOPES}
+    return {"ok": ok, "message": msg, "token_path": TOKEN_PATH, "scopes": SCOPES, "service": _service_stats()}
 
 @mcp.tool()
 def gmail_unread_count() -> Dict[str, Any]:
@@ -201,26 +458,52 @@ def gmail_list(query: str = "", max_results: int = 10) -> Dict[str, Any]:
     """
     Search and list messages. Returns lightweight cards: id, threadId, headers, snippet.
     - query: Gmail search string (e.g., 'from:amazon subject:invoice newer_than:7d')
+    - max_results: may be larger than one Gmail page; for big result sets prefer gmail_list_page
     """
     print("Calling gmail_list()")
     svc = _gmail_service()
-    result = svc.users().messages().list(userId="me", q=query, maxResults=max_results).execute()
-    ids = result.get("messages", []) or []
-
-    out = []
-    for m in ids:
-        msg = svc.users().messages().get(userId="me", id=m["id"], format="metadata", metadataHeaders=list(HEADER_WANTED)).execute()
-        headers = _pluck_headers(msg.get("payload", {}).get("headers", []))
-        snippet = msg.get("snippet", "") or ""
-        out.append({
-            "id": msg["id"],
-            "threadId": msg.get("threadId"),
-            "headers": headers,
-            "snippet": snippet,
-        })
+    _sync_store(svc)
+
+    ids = STORE.query_ids(query, max_results) if STORE is not None else None
+    if ids is not None:
+        out = _get_metadata(svc, ids)
+    else:
+        out = []
+        for cards, _ in _list_pages(svc, query, max_results, GMAIL_LIST_PAGE_LIMIT):
+            out.extend(cards)
+        if STORE is not None:
+            STORE.remember_query(query, max_results, [card["id"] for card in out])
 
     return {"ok": True, "query": query, "count": len(out), "messages": out}
 
+@mcp.tool()
+def gmail_list_page(query: str = "", page_size: int = 25, cursor: str = "") -> Dict[str, Any]:
+    """
+    List messages one page at a time. Returns up to page_size cards (id, threadId, headers, snippet)
+    and next_cursor. Call again with cursor=next_cursor for the next page; next_cursor is null on the last page.
+    - query: Gmail search string (e.g., 'from:kotak newer_than:7d'); ignored when cursor is given
+    - page_size: cards per page (max 100)
+    """
+    print("Calling gmail_list_page()", file=sys.stderr)     # stdout is the MCP stdio stream
+    page_token = None
+    if cursor:
+        try:
+            query, page_size, page_token = _decode_cursor(cursor)
+        except ValueError:
+            return {"ok": False, "error": "Invalid cursor: pass next_cursor exactly as a previous gmail_list_page call returned it"}
+    page_size = max(1, min(MAX_CURSOR_PAGE, page_size))
+
+    svc = _gmail_service()
+    _sync_store(svc)
+    cards, next_token = next(_list_pages(svc, query, page_size, page_size, page_token), ([], None))
+    return {
+        "ok": True,
+        "query": query,
+        "count": len(cards),
+        "messages": cards,
+        "next_cursor": _encode_cursor(query, page_size, next_token) if next_token else None,
+    }
+
 @mcp.tool()
 def gmail_read(message_id: str) -> Dict[str, Any]:
     """
@@ -228,10 +511,16 @@ def gmail_read(message_id: str) -> Dict[str, Any]:
     """
     print("Calling gmail_read()")
     svc = _gmail_service()
+    _sync_store(svc)
+    if STORE is not None and (stored := STORE.message(message_id)) is not None:
+        return stored
+
     msg = svc.users().messages().get(userId="me", id=message_id, format="full").execute()
     payload = msg.get("payload", {})
     headers = _pluck_headers(payload.get("headers", []))
     text = _decode_body(payload)
+    if STORE is not None:
+        STORE.put_message(msg, headers, text)
     return {
         "ok": True,
         "id": msg["id"],
@@ -244,6 +533,42 @@ def gmail_read(message_id: str) -> Dict[str, Any]:
         "internalDate": msg.get("internalDate")  # ms since epoch
     }
 
+@mcp.tool()
+def gmail_search_local(query: str = "", max_results: int = 20) -> Dict[str, Any]:
+    """
+    Search the local copy of the mailbox, offline and in milliseconds, best match first.
+    Covers messages already listed or read plus all mail received since the local store started;
+    use gmail_list when it must be complete. Syncs first when it can; synced=false and
+    last_sync_seconds_ago say how stale the results may be.
+    - query: words and "phrases" plus from:, to:, subject:, newer_than: (7d, 2m, 1y), older_than:, is:unread, is:read, -word,
+      a OR b, {a b} (either), (a b) (both), -(a b)
+    """
+    print("Calling gmail_search_local()", file=sys.stderr)
+    if STORE is None:
+        return {"ok": False, "error": "The local store is off (set GMAIL_STORE_DB to turn it on); use gmail_list."}
+    synced = _sync_store_if_online()
+    freshness = {"synced": synced, "last_sync_seconds_ago": STORE.seconds_since_sync()}
+
+    start = time.perf_counter()
+    try:
+        out = STORE.search(query, max(1, max_results))
+    except ValueError as e:
+        return {"ok": False, "query": query, "error": str(e), **freshness}
+    return {"ok": True, "query": query, "count": len(out), "messages": out,
+            "took_ms": round((time.perf_counter() - start) * 1000, 2), **freshness}
+
+@mcp.tool()
+def gmail_store_status() -> Dict[str, Any]:
+    """
+    Freshness and size of the local message store that gmail_list/gmail_read answer from:
+    message count, bytes on disk, historyId and seconds since the last sync, hit rate.
+    """
+    print("Calling gmail_store_status()", file=sys.stderr)
+    if STORE is None:
+        return {"ok": False, "message": "The local store is off (set GMAIL_STORE_DB to turn it on)."}
+    synced = _sync_store_if_online()
+    return {"ok": True, "synced": synced, "sync_interval_seconds": STORE_SYNC_INTERVAL, **STORE.stats()}
+
 if __name__ == "__main__":
     # stdio so MCP clients can attach
     mcp.run(transport="stdio")
@@ -0,0 +1,426 @@
+# message_store.py
+# ----------------
+# Local SQLite copy of the Gmail messages the tools have seen, so repeat lists and reads
+# are answered without the API.
+#
+#   store = MessageStore("gmail_store.db")
+#   store.cards(ids)                 # cached cards for these ids; fetch the rest, then put_message()
+#   store.put_message(msg)           # a messages.get response (metadata or full format)
+#   store.message(id)                # cached gmail_read result, or None if the body was never fetched
+#   store.query_ids(q, n)            # ids a recent identical search returned, or None
+#   store.search("from:kotak newer_than:7d is:unread statement", 20)   # offline, ranked
+#   store.search("{kotak hdfc} statement -(credit card)", 20)           # Gmail's OR / {} / () grouping
+#
+# search() runs on an FTS5 index of sender, recipient, subject, snippet and decoded body,
+# kept in step with the messages table by triggers. It covers what the store holds: every
+# message the tools have listed or read, plus all mail that arrived since the store started.
+#
+# gmail_server.py keeps it current with users.history.list from the last seen historyId:
+# deleted messages are dropped, label changes (read/unread, archive) are applied, new
+# messages are added, and any change clears the remembered search results.
+
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+# Relative dates in newer_than:/older_than:, as Gmail reads them
+_PERIOD_SECONDS = {"d": 86400, "m": 30 * 86400, "y": 365 * 86400}
+# A search is a list of tokens: group brackets, "OR", and terms (optionally -negated and/or operator:prefixed)
+_SEARCH_TOKEN_RE = re.compile(r'(-?)(?:(\w+):)?([({])|([)}])|(-?)(?:(\w+):)?("[^"]*"|[^\s(){}]+)')
+_CLOSERS = {"(": ")", "{": "}"}
+# FTS5 columns the field operators search in
+_FIELD_COLUMNS = {"from": "sender", "to": "recipient", "subject": "subject"}
+# bm25 weights per column (id, sender, recipient, subject, snippet, body): a hit in the subject counts most
+_RANK = "bm25(message_index, 0, 4.0, 1.0, 5.0, 2.0, 1.0)"
+
+SEARCH_OPERATORS = ("from:, to:, subject:, newer_than:, older_than:, is:unread, is:read, \"quoted phrases\", -term, "
+                    "OR, {any of these}, (all of these)")
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _search_tokens(query: str) -> list:
+    tokens = []
+    for group_negate, group_operator, opener, closer, negate, operator, value in _SEARCH_TOKEN_RE.findall(query):
+        if opener:
+            tokens.append(("open", opener, bool(group_negate), group_operator.lower()))
+        elif closer:
+            tokens.append(("close", closer))
+        elif value == "OR" and not negate and not operator:
+            tokens.append(("or",))
+        elif value == "AND" and not negate and not operator:
+            continue        # Gmail's explicit AND is what juxtaposition means anyway
+        else:
+            tokens.append(("term", bool(negate), operator.lower(), value))
+    return tokens
+
+
+def parse_search(query: str, now: float) -> tuple:
+    """
+    Split a Gmail-style search into an FTS5 MATCH expression (None when there is no text to
+    match) and SQL filters on the messages table. Raises ValueError for operators it can't run.
+
+    As in Gmail, `a OR b` and `{a b}` match either term and bind tighter than the implicit AND,
+    `(a b)` groups, and `-` negates a term or a group. Only text terms can be OR-ed: the date and
+    read-state filters are SQL conditions ANDed onto the whole search.
+
+    Parsed terms are (negated, fts, where, params): an FTS5 expression (or None) plus SQL conditions.
+    """
+    tokens = _search_tokens(query)
+    pos = 0
+
+    def term(negate: bool, operator: str, value: str, column: Optional[str]) -> tuple:
+        value = value.strip('"')
+        if not value:
+            return None
+        if operator in _FIELD_COLUMNS:
+            return negate, f"{_FIELD_COLUMNS[operator]} : {_phrase(value)}", [], []
+        if operator in ("newer_than", "older_than"):
+            period = re.fullmatch(r"(\d+)([dmy])", value.lower())
+            if not period:
+                raise ValueError(f"{operator}: takes a number of days, months or years, like 7d, 2m or 1y (got {value!r})")
+            cutoff_ms = int((now - int(period.group(1)) * _PERIOD_SECONDS[period.group(2)]) * 1000)
+            return negate, None, ["m.internal_date >= ?" if operator == "newer_than" else "m.internal_date < ?"], [cutoff_ms]
+        if operator == "is" and value.lower() in ("unread", "read"):
+            unread = (value.lower() == "unread") != negate
+            return False, None, [("" if unread else "NOT ") + "EXISTS (SELECT 1 FROM json_each(m.label_ids) WHERE value = 'UNREAD')"], []
+        if operator:
+            raise ValueError(f"{operator}: isn't supported locally (supported: {SEARCH_OPERATORS}); use gmail_list for it")
+        return negate, f"{column} : {_phrase(value)}" if column else _phrase(value), [], []
+
+    def unary(column: Optional[str]) -> tuple:
+        nonlocal pos
+        token = tokens[pos]
+        pos += 1
+        if token[0] == "term":
+            return term(*token[1:], column)
+        if token[0] == "open":
+            _, opener, negate, operator = token
+            if operator and operator not in _FIELD_COLUMNS:
+                raise ValueError(f"{operator}:{opener}...{_CLOSERS[opener]} isn't supported locally; use gmail_list for it")
+            inner = group(opener, _FIELD_COLUMNS.get(operator, column))
+            return None if inner is None else (negate != inner[0], *inner[1:])
+        raise ValueError(f"unexpected {token[1] if token[0] == 'close' else 'OR'} in the search")
+
+    def alternatives(column: Optional[str]) -> tuple:
+        """One term, or several joined by OR"""
+        nonlocal pos
+        items = [unary(column)]
+        while pos < len(tokens) and tokens[pos][0] == "or":
+            pos += 1
+            if pos == len(tokens) or tokens[pos][0] in ("or", "close"):
+                raise ValueError("OR needs a term on both sides")
+            items.append(unary(column))
+        return _any_of(items) if len(items) > 1 else items[0]
+
+    def group(opener: str, column: Optional[str]) -> tuple:
+        nonlocal pos
+        items = []
+        while pos < len(tokens) and tokens[pos] != ("close", _CLOSERS[opener]):
+            items.append(alternatives(column))
+        if pos == len(tokens):
+            raise ValueError(f"{opener} without a matching {_CLOSERS[opener]} in the search")
+        pos += 1
+        return _any_of(items) if opener == "{" else _all_of(items)
+
+    items = []
+    while pos < len(tokens):
+        items.append(alternatives(None))
+    _, fts, where, params = _all_of(items) or (False, None, [], [])
+    return fts, where, params
+
+
+def _all_of(items: list) -> Optional[tuple]:
+    """AND the parsed terms: FTS terms become one expression (negated ones as NOT), SQL conditions are ANDed"""
+    items = [item for item in items if item is not None]
+    if not items:
+        return None
+    if len(items) == 1 and not items[0][0]:
+        return items[0]
+
+    positive, negative, where, params = [], [], [], []
+    for negate, fts, conditions, values in items:
+        if fts is not None and conditions:
+            raise ValueError("a negated group can't mix text with newer_than:/older_than:/is: locally; use gmail_list")
+        if fts is not None:
+            (negative if negate else positive).append(fts)
+        elif conditions:
+            where.append(f"NOT ({' AND '.join(conditions)})" if negate else " AND ".join(conditions))
+            params += values
+    if negative and not positive:
+        raise ValueError("-term needs at least one term to search for")
+
+    fts = "(" + " AND ".join(positive) + ")" if len(positive) > 1 else (positive[0] if positive else None)
+    for term in negative:
+        fts = f"({fts} NOT {term})"
+    return False, fts, where, params
+
+
+def _any_of(items: list) -> Optional[tuple]:
+    """OR the parsed terms; only positive text terms can be combined this way in FTS5"""
+    items = [item for item in items if item is not None]
+    if not items:
+        return None
+    if len(items) == 1:
+        return items[0]
+    for negate, fts, conditions, _ in items:
+        if fts is None or conditions or negate:
+            raise ValueError("OR and {...} can only combine words, phrases and from:/to:/subject: terms locally "
+                             "(not -terms, newer_than:, older_than: or is:); use gmail_list for it")
+    return False, "(" + " OR ".join(item[1] for item in items) + ")", [], []
+
+
+class MessageStore:
+    # Bump when the layout changes; older files are rebuilt, they're only a cache
+    SCHEMA_VERSION = 2
+
+    def __init__(self, db_path: str, query_ttl: float):
+        self.db_path = db_path
+        self.query_ttl = query_ttl
+        self.hits = 0               # messages served from the store
+        self.misses = 0             # messages that had to be fetched
+        self.query_hits = 0         # searches answered without messages.list
+        self.history_changes = 0    # history records applied by sync
+        self.resyncs = 0            # history gaps that forced a fresh baseline
+        self.searches = 0
+
+        self._db = sqlite3.connect(db_path)
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            self._db.executescript(
+                "DROP TABLE IF EXISTS message_index; DROP TABLE IF EXISTS messages; DROP TABLE IF EXISTS queries; DROP TABLE IF EXISTS meta;")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id TEXT PRIMARY KEY,
+                thread_id TEXT,
+                label_ids TEXT NOT NULL,
+                headers TEXT NOT NULL,
+                snippet TEXT NOT NULL,
+                internal_date INTEGER,
+                size_estimate INTEGER,
+                body_text TEXT,
+                stored_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS queries (
+                query TEXT NOT NULL,
+                max_results INTEGER NOT NULL,
+                ids TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (query, max_results)
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+        # Full-text index over the same rows (rowid = messages.rowid); the triggers keep it current
+        self._db.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS message_index USING fts5(
+                id UNINDEXED, sender, recipient, subject, snippet, body, tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS messages_indexed AFTER INSERT ON messages BEGIN
+                INSERT INTO message_index (rowid, id, sender, recipient, subject, snippet, body)
+                VALUES (new.rowid, new.id, json_extract(new.headers, '$.From'), json_extract(new.headers, '$.To'),
+                        json_extract(new.headers, '$.Subject'), new.snippet, COALESCE(new.body_text, ''));
+            END;
+            CREATE TRIGGER IF NOT EXISTS messages_reindexed AFTER UPDATE OF headers, snippet, body_text ON messages BEGIN
+                DELETE FROM message_index WHERE rowid = old.rowid;
+                INSERT INTO message_index (rowid, id, sender, recipient, subject, snippet, body)
+                VALUES (new.rowid, new.id, json_extract(new.headers, '$.From'), json_extract(new.headers, '$.To'),
+                        json_extract(new.headers, '$.Subject'), new.snippet, COALESCE(new.body_text, ''));
+            END;
+            CREATE TRIGGER IF NOT EXISTS messages_unindexed AFTER DELETE ON messages BEGIN
+                DELETE FROM message_index WHERE rowid = old.rowid;
+            END;
+        """)
+        self._db.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self._db.commit()
+
+    # ---------- messages ----------
+
+    def put_message(self, msg: Dict[str, Any], headers: Dict[str, str], body_text: Optional[str] = None) -> None:
+        """Store a messages.get response; a metadata-only fetch keeps any body already stored."""
+        self._db.execute(
+            """
+            INSERT INTO messages (id, thread_id, label_ids, headers, snippet, internal_date, size_estimate, body_text, stored_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                thread_id = excluded.thread_id, label_ids = excluded.label_ids, headers = excluded.headers,
+                snippet = excluded.snippet, internal_date = excluded.internal_date,
+                size_estimate = excluded.size_estimate, body_text = COALESCE(excluded.body_text, body_text),
+                stored_at = excluded.stored_at
+            """,
+            (msg["id"], msg.get("threadId"), json.dumps(msg.get("labelIds", [])), json.dumps(headers),
+             msg.get("snippet", "") or "", int(msg.get("internalDate") or 0) or None, msg.get("sizeEstimate", 0),
+             body_text, time.time()),
+        )
+        self._db.commit()
+
+    def cards(self, message_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """id -> gmail_list card for the ids that are stored."""
+        found = {}
+        for chunk in _chunks(message_ids, 500):
+            rows = self._db.execute(
+                f"SELECT id, thread_id, headers, snippet FROM messages WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for message_id, thread_id, headers, snippet in rows:
+                found[message_id] = {"id": message_id, "threadId": thread_id, "headers": json.loads(headers), "snippet": snippet}
+        self.hits += len(found)
+        self.misses += len(set(message_ids)) - len(found)
+        return found
+
+    def message(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """The gmail_read result for a message whose body was fetched before, else None."""
+        row = self._db.execute(
+            "SELECT thread_id, label_ids, headers, snippet, body_text, size_estimate, internal_date FROM messages WHERE id = ? AND body_text IS NOT NULL",
+            (message_id,),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        thread_id, label_ids, headers, snippet, body_text, size_estimate, internal_date = row
+        return {
+            "ok": True,
+            "id": message_id,
+            "threadId": thread_id,
+            "labels": json.loads(label_ids),
+            "headers": json.loads(headers),
+            "snippet": snippet,
+            "body_text": body_text,
+            "size_estimate": size_estimate,
+            "internalDate": str(internal_date) if internal_date else None,
+        }
+
+    def delete(self, message_ids: List[str]) -> None:
+        self._db.executemany("DELETE FROM messages WHERE id = ?", [(i,) for i in message_ids])
+        self._db.commit()
+
+    def change_labels(self, message_id: str, added: List[str] = (), removed: List[str] = ()) -> None:
+        row = self._db.execute("SELECT label_ids FROM messages WHERE id = ?", (message_id,)).fetchone()
+        if row is None:
+            return
+        labels = [label for label in json.loads(row[0]) if label not in removed]
+        labels += [label for label in added if label not in labels]
+        self._db.execute("UPDATE messages SET label_ids = ? WHERE id = ?", (json.dumps(labels), message_id))
+        self._db.commit()
+
+    # ---------- local search ----------
+
+    def search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        """
+        Gmail-style search over the stored messages, best match first (bm25, subject and sender
+        weighted up); searches with only filters come back newest first. Raises ValueError for
+        operators it doesn't support.
+        """
+        match, where, params = parse_search(query, time.time())
+        self.searches += 1
+        if match is not None:
+            sql = (f"SELECT m.id, m.thread_id, m.headers, m.snippet, m.label_ids, m.internal_date, {_RANK} AS score "
+                   "FROM message_index JOIN messages m ON m.rowid = message_index.rowid "
+                   "WHERE message_index MATCH ?")
+            params = [match] + params
+            order = "score, m.internal_date DESC"
+        else:
+            sql = ("SELECT m.id, m.thread_id, m.headers, m.snippet, m.label_ids, m.internal_date, NULL AS score "
+                   "FROM messages m WHERE 1 = 1")
+            order = "m.internal_date DESC"
+        sql += "".join(f" AND {condition}" for condition in where) + f" ORDER BY {order} LIMIT ?"
+
+        try:
+            rows = self._db.execute(sql, params + [max_results]).fetchall()
+        except sqlite3.OperationalError as e:
+            # An FTS5 syntax error from odd input: report it like a bad operator
+            raise ValueError(f"could not run this search locally: {e}") from e
+
+        return [
+            {
+                "id": message_id,
+                "threadId": thread_id,
+                "headers": json.loads(headers),
+                "snippet": snippet,
+                "labels": json.loads(label_ids),
+                "internalDate": str(internal_date) if internal_date else None,
+                "score": round(-score, 4) if score is not None else None,
+            }
+            for message_id, thread_id, headers, snippet, label_ids, internal_date, score in rows
+        ]
+
+    # ---------- remembered gmail_list searches ----------
+
+    def query_ids(self, query: str, max_results: int) -> Optional[List[str]]:
+        """
+        Ids an identical search returned, if nothing has changed in the mailbox since and it is
+        younger than query_ttl (relative dates like newer_than:7d drift with the clock).
+        """
+        row = self._db.execute(
+            "SELECT ids, stored_at FROM queries WHERE query = ? AND max_results = ?", (query, max_results)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.query_ttl:
+            return None
+        self.query_hits += 1
+        return json.loads(row[0])
+
+    def remember_query(self, query: str, max_results: int, message_ids: List[str]) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO queries (query, max_results, ids, stored_at) VALUES (?, ?, ?, ?)",
+            (query, max_results, json.dumps(message_ids), time.time()),
+        )
+        self._db.commit()
+
+    def forget_queries(self) -> None:
+        self._db.execute("DELETE FROM queries")
+        self._db.commit()
+
+    # ---------- sync state ----------
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, **values) -> None:
+        self._db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items()])
+        self._db.commit()
+
+    def reset(self, history_id: str) -> None:
+        """Start over from `history_id`: the history between the stored state and now is gone."""
+        self.resyncs += 1
+        self._db.executescript("DELETE FROM messages; DELETE FROM queries;")
+        self.set_meta(history_id=history_id, synced_at=time.time())
+
+    def seconds_since_sync(self) -> Optional[float]:
+        """Age of the last successful history sync, or None if the store was never synced"""
+        synced_at = self.get_meta("synced_at")
+        return round(time.time() - float(synced_at), 1) if synced_at else None
+
+    def stats(self) -> Dict[str, Any]:
+        messages, with_body, body_bytes = self._db.execute(
+            "SELECT COUNT(*), COUNT(body_text), COALESCE(SUM(LENGTH(body_text)), 0) FROM messages"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "db_path": self.db_path,
+            "messages": messages,
+            "messages_with_body": with_body,
+            "body_bytes": body_bytes,
+            "file_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+            "cached_searches": self._db.execute("SELECT COUNT(*) FROM queries").fetchone()[0],
+            "history_id": self.get_meta("history_id"),
+            "last_sync_seconds_ago": self.seconds_since_sync(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "search_hits": self.query_hits,
+            "local_searches": self.searches,
+            "history_changes": self.history_changes,
+            "resyncs": self.resyncs,
+        }
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,92 @@
+# Offline search over the local message store: Gmail's OR, {...}, (...) and -group syntax.
+#
+# Run:
+#   python -m pytest test_message_store.py
+
+import re
+import time
+
+import pytest
+
+from message_store import MessageStore, parse_search
+
+NOW_MS = int(time.time() * 1000)
+DAY_MS = 86400 * 1000
+
+MESSAGES = [
+    # id, sender, subject, snippet, age in days, unread
+    ("m1", "Kotak Bank <alerts@kotak.com>", "Statement ready", "Your card statement is ready", 1, True),
+    ("m2", "HDFC Bank <alerts@hdfc.com>", "Statement ready", "Your savings statement is ready", 3, False),
+    ("m3", "Amazon <orders@amazon.com>", "Your invoice", "Invoice for order 123", 20, True),
+    ("m4", "Mum <mum@example.com>", "Dinner or lunch", "Shall we meet for dinner or lunch", 2, False),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MessageStore(str(tmp_path / "store.db"), query_ttl=600)
+    for message_id, sender, subject, snippet, age_days, unread in MESSAGES:
+        store.put_message(
+            {"id": message_id, "threadId": message_id, "snippet": snippet,
+             "labelIds": ["INBOX", "UNREAD"] if unread else ["INBOX"], "internalDate": str(NOW_MS - age_days * DAY_MS)},
+            {"From": sender, "To": "me@example.com", "Subject": subject},
+        )
+    yield store
+    store.close()
+
+
+def ids(store, query):
+    return sorted(m["id"] for m in store.search(query, 20))
+
+
+def test_or_matches_either_term_not_the_word_or(store):
+    assert ids(store, "kotak OR amazon") == ["m1", "m3"]
+    assert ids(store, "from:kotak OR from:hdfc") == ["m1", "m2"]
+
+
+def test_lowercase_or_is_a_word(store):
+    assert ids(store, "dinner or lunch") == ["m4"]
+
+
+def test_or_binds_tighter_than_and(store):
+    # Gmail reads "statement kotak OR hdfc" as statement AND (kotak OR hdfc)
+    assert ids(store, "statement kotak OR hdfc") == ["m1", "m2"]
+    assert ids(store, "invoice kotak OR hdfc") == []
+
+
+def test_braces_match_any_term(store):
+    assert ids(store, "{kotak amazon}") == ["m1", "m3"]
+    assert ids(store, "subject:{invoice dinner}") == ["m3", "m4"]
+
+
+def test_parentheses_group_and_negate(store):
+    assert ids(store, "statement -(savings hdfc)") == ["m1"]
+    assert ids(store, "ready -{kotak hdfc}") == []
+    assert ids(store, "{statement invoice} -from:amazon") == ["m1", "m2"]
+
+
+def test_filters_and_with_or_groups(store):
+    assert ids(store, "{kotak hdfc amazon} is:unread") == ["m1", "m3"]
+    assert ids(store, "{kotak hdfc amazon} newer_than:7d") == ["m1", "m2"]
+    assert ids(store, "{kotak hdfc amazon} -newer_than:7d") == ["m3"]
+
+
+@pytest.mark.parametrize("query, message", [
+    ("kotak OR is:unread", "OR and {...} can only combine"),
+    ("{kotak newer_than:7d}", "OR and {...} can only combine"),
+    ("{kotak -hdfc}", "OR and {...} can only combine"),
+    ("kotak OR", "OR needs a term on both sides"),
+    ("(kotak hdfc", "without a matching )"),
+    ("kotak)", "unexpected )"),
+    ("label:(inbox)", "isn't supported locally"),
+    ("-kotak", "-term needs at least one term"),
+])
+def test_unsupported_grouping_is_a_clear_error(store, query, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        store.search(query, 20)
+
+
+def test_parse_search_plain_terms_are_unchanged():
+    fts, where, params = parse_search('from:kotak "card statement" -savings', time.time())
+    assert fts == '((sender : "kotak" AND "card statement") NOT "savings")'
+    assert where == [] and params == []
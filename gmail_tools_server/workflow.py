@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import asyncio
 from dotenv import load_dotenv
@@ -7,7 +8,13 @@ import tool_def_maker
 # MCP + LangChain imports
 from langchain_mcp_adapters.client import MultiServerMCPClient
 
+# The agents import helpers from agent_core/ at the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import agents.planner, agents.task_executor, agents.urgency_classifier
+from agent_core.llm import print_token
+from agent_core.cassette import CASSETTE
+from agent_core.llm_cache import LLM_CACHE
+from agent_core.tracing import span
 
 
 
@@ -47,30 +54,46 @@ async def main():
     # 2️⃣ Initialize MCP client
     client = MultiServerMCPClient(mcp_servers)
 
-    # 3️⃣ Ensure OpenAI key is available
-    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-    if not os.environ.get("OPENAI_API_KEY"):
-        raise ValueError("❌ OPENAI_API_KEY not found in .env file!")
-
-    # 4️⃣ Collect tools exposed by the MCP servers
-    tools = await client.get_tools()
-
-    if tools:
-        tool_defs = [tool_def_maker.lc_tool_to_openai_def(t) for t in tools]
-        tool_mapping = tool_def_maker.build_tool_mapping(tools, tool_defs)
-
-    strategy= agents.planner.planner_claude("I need a list of emails related to Kotak Bank I got this whole week from my inbox",tool_defs)
+    if CASSETTE.replaying:
+        # Offline: the tool list and every LLM / tool answer come from the cassette
+        tool_defs = CASSETTE.value("tool_defs")
+        tool_mapping = CASSETTE.replay_tool_mapping(tool_defs)
+    else:
+        # 3️⃣ Ensure OpenAI key is available
+        os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+        if not os.environ.get("OPENAI_API_KEY"):
+            raise ValueError("❌ OPENAI_API_KEY not found in .env file!")
+
+        # 4️⃣ Collect tools exposed by the MCP servers
+        tools = await client.get_tools()
+
+        if tools:
+            tool_defs = [tool_def_maker.lc_tool_to_openai_def(t) for t in tools]
+            tool_mapping = tool_def_maker.build_tool_mapping(tools, tool_defs)
+            if CASSETTE.recording:
+                CASSETTE.record_value("tool_defs", tool_defs)
+
+    with span("planner", "stage"):
+        strategy= await agents.planner.planner_claude("I need a list of emails related to Kotak Bank I got this whole week from my inbox",tool_defs)
     print(strategy)
     print("*************************")
 
-    answer = await agents.task_executor.task_executor_openai(strategy,tool_mapping,tool_defs)
-    print(answer)
+    with span("task_executor", "stage"):
+        answer = await agents.task_executor.task_executor_openai(strategy,tool_mapping,tool_defs,on_token=print_token)
+    print()
     print("*************************")
 
-    urgency = await agents.urgency_classifier.urgency_classifier_ollama(answer,tool_mapping,tool_defs)
-    print(urgency)
+    with span("urgency_classifier", "stage"):
+        urgency = await agents.urgency_classifier.urgency_classifier_ollama(answer,tool_mapping,tool_defs,on_token=print_token)
+    print()
     print("*************************")
 
+    if LLM_CACHE.enabled:
+        print(LLM_CACHE.report())
+    if CASSETTE.mode:
+        print(f"[cassette] {CASSETTE.stats()}")
+        CASSETTE.close()
+
 
 
 # ------------------------------------------------------------------
@@ -1,15 +1,20 @@
 # api.py
 # Run with: uv run uvicorn api:app --reload --port 8000
 
+import asyncio
+import json
 import os
+from contextlib import asynccontextmanager
 from typing import Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from neo4j_runner import run_neo4j_task
+from neo4j_runner import MCPSessionPool, load_mcp_config, run_neo4j_task
+from agent_core.llm_cache import LLM_CACHE
 
 load_dotenv()
 
@@ -19,7 +24,19 @@ if not OPENAI_API_KEY:
 
 os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
-app = FastAPI(title="Neo4j MCP UI API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One set of MCP server processes for the whole app instead of one per request
+    app.state.mcp_pool = MCPSessionPool(load_mcp_config())
+    await app.state.mcp_pool.start()
+    try:
+        yield
+    finally:
+        await app.state.mcp_pool.close()
+        LLM_CACHE.close()
+
+
+app = FastAPI(title="Neo4j MCP UI API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,16 +54,71 @@ class ExecuteResponse(BaseModel):
     result: str
 
 @app.get("/health")
-async def health():
-    return {"status": "ok"}
+async def health(request: Request):
+    return {"status": "ok", "mcp_pool": request.app.state.mcp_pool.stats(), "llm_cache": LLM_CACHE.stats()}
 
 @app.post("/execute", response_model=ExecuteResponse)
-async def execute(req: ExecuteRequest):
+async def execute(req: ExecuteRequest, request: Request):
     if not req.prompt.strip():
         raise HTTPException(status_code=400, detail="Prompt cannot be empty.")
 
     try:
-        result = await run_neo4j_task(req.prompt)
+        result = await run_neo4j_task(req.prompt, pool=request.app.state.mcp_pool)
         return ExecuteResponse(success=True, result=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Execution error: {e}")
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/execute/stream")
+async def execute_stream(req: ExecuteRequest, request: Request):
+    """
+    Same task as /execute, streamed as Server-Sent Events while it runs:
+      stage        {"name": "query" | "answer"}   one per executor
+      token        {"text": ...}                  answer text as the model writes it
+      tool_call    {"id", "name", "arguments"}
+      tool_result  {"id", "name", "seconds", "chars", "error"}
+      turn         per-turn timing and token counts
+      done         {"result": ...}                 the same string /execute returns
+      error        {"detail": ...}
+    The task is cancelled if the client disconnects.
+    """
+    if not req.prompt.strip():
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty.")
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run():
+        try:
+            result = await run_neo4j_task(
+                req.prompt,
+                on_token=lambda text: queue.put_nowait(sse("token", {"text": text})),
+                on_event=lambda kind, data: queue.put_nowait(sse(kind, data)),
+                pool=request.app.state.mcp_pool,
+            )
+            queue.put_nowait(sse("done", {"result": result}))
+        except Exception as e:
+            queue.put_nowait(sse("error", {"detail": f"Execution error: {e}"}))
+        finally:
+            queue.put_nowait(None)
+
+    async def events():
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            # Client went away (or we're done): don't keep paying for LLM calls nobody will read
+            task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
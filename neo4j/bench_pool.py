@@ -0,0 +1,162 @@
+# bench_pool.py
+# -------------
+# Per-request MCP overhead with and without the session pool in neo4j_runner.py.
+# One "request" is everything run_neo4j_task does apart from the LLM calls: get the
+# tools and the schema prompt, then make --tool-calls tool calls.
+#
+# Then --concurrency requests at once against a pool of --pool-size sessions, with
+# --llm-ms of sleep before each tool call standing in for the LLM turn that asked for it:
+# holding one session for the whole request (the pool's old behaviour) vs. borrowing one
+# per tool call, as run_neo4j_task does now.
+#
+# Run:
+#   python bench_pool.py --requests 10
+#   python bench_pool.py --concurrency 8 --pool-size 2 --llm-ms 500
+#   python bench_pool.py --config neo4j_config.json   # the real server (needs NEO4J_* in .env)
+#
+# By default it talks to a stub MCP server with the same tool and prompt names, so it
+# needs no database; the real server adds the Neo4j driver connect and schema queries
+# on top of the stub's spawn + handshake cost for every unpooled request.
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import neo4j_runner
+
+logging.getLogger("mcp").setLevel(logging.WARNING)
+
+STUB_SERVER = '''
+from mcp.server.fastmcp import FastMCP
+
+mcp = FastMCP("Neo4j Stub Server", log_level="WARNING")
+
+
+@mcp.tool()
+def list_labels() -> list[str]:
+    """List all node labels in the database."""
+    return ["Control", "Category", "Domain"]
+
+
+@mcp.tool()
+def run_cypher(query: str) -> list[dict]:
+    """Run any Cypher query."""
+    return [{"query": query}]
+
+
+@mcp.prompt(name="neo4j_schema", description="Stub schema")
+def neo4j_schema_prompt() -> list[dict]:
+    return [{"role": "assistant", "content": "Node properties (by label):\\n- (:`Control`): ['name']"}]
+
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
+'''
+
+
+def stub_config(directory: str) -> dict:
+    path = os.path.join(directory, "stub_server.py")
+    with open(path, "w") as f:
+        f.write(STUB_SERVER)
+    return {"neo4j": {"command": sys.executable, "args": [path], "transport": "stdio"}}
+
+
+async def call_tools(tool_mapping: dict, n: int, llm_seconds: float = 0.0) -> None:
+    tool = tool_mapping["list_labels"]
+    for _ in range(n):
+        await asyncio.sleep(llm_seconds)
+        await tool.coroutine()      # how agent_core/tools.py calls it
+
+
+async def unpooled_request(mcp_servers: dict, tool_calls: int) -> None:
+    tool_mapping, _, _ = await neo4j_runner.one_shot_setup(mcp_servers)
+    await call_tools(tool_mapping, tool_calls)
+
+
+async def pooled_request(pool: neo4j_runner.MCPSessionPool, tool_calls: int, llm_seconds: float = 0.0) -> None:
+    tool_mapping, _, _ = await pool.setup()
+    await call_tools(tool_mapping, tool_calls, llm_seconds)
+
+
+async def held_request(pool: neo4j_runner.MCPSessionPool, tool_calls: int, llm_seconds: float) -> None:
+    """One session checked out for the whole request, LLM turns included"""
+    async with pool.session() as mcp:
+        await call_tools(mcp.tool_mapping, tool_calls, llm_seconds)
+
+
+async def throughput(n: int, concurrency: int, request) -> float:
+    """Requests per second for n requests, `concurrency` of them in flight at a time"""
+    queue = asyncio.Queue()
+    for _ in range(n):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            await request()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return n / (time.perf_counter() - start)
+
+
+async def timed(n: int, request) -> list:
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await request()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label: str, latencies: list) -> None:
+    print(f"{label:<10} n={len(latencies):<4} p50={statistics.median(latencies):9.1f} ms   "
+          f"max={max(latencies):9.1f} ms   mean={statistics.mean(latencies):9.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="MCP per-request overhead, pooled vs. unpooled")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--tool-calls", type=int, default=2, help="tool calls per request")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight for the throughput run")
+    parser.add_argument("--pool-size", type=int, default=neo4j_runner.MCP_POOL_SIZE)
+    parser.add_argument("--llm-ms", type=float, default=500.0, help="simulated LLM turn before each tool call")
+    parser.add_argument("--config", help="mcpServers JSON to use instead of the stub server")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mcp_servers = neo4j_runner.load_mcp_config(args.config) if args.config else stub_config(tmp)
+
+        report("unpooled", await timed(args.requests, lambda: unpooled_request(mcp_servers, args.tool_calls)))
+
+        pool = neo4j_runner.MCPSessionPool(mcp_servers, size=1)
+        start = time.perf_counter()
+        await pool.start()
+        print(f"pool start {(time.perf_counter() - start) * 1000:9.1f} ms (once, at app startup)")
+        try:
+            report("pooled", await timed(args.requests, lambda: pooled_request(pool, args.tool_calls)))
+        finally:
+            await pool.close()
+
+        pool = neo4j_runner.MCPSessionPool(mcp_servers, size=args.pool_size)
+        await pool.start()
+        try:
+            n = args.concurrency * 2
+            llm = args.llm_ms / 1000
+            print(f"\n{n} requests, {args.concurrency} at a time, pool of {pool.size}, "
+                  f"{args.tool_calls} tool calls after {args.llm_ms:.0f} ms LLM turns each")
+            held = await throughput(n, args.concurrency, lambda: held_request(pool, args.tool_calls, llm))
+            per_call = await throughput(n, args.concurrency, lambda: pooled_request(pool, args.tool_calls, llm))
+            print(f"session held per request   {held:6.2f} req/s")
+            print(f"session per tool call      {per_call:6.2f} req/s   ({per_call / held:.1f}x)")
+        finally:
+            await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import asyncio
 from dotenv import load_dotenv
@@ -8,6 +9,9 @@ load_dotenv()
 from langchain_mcp_adapters.client import MultiServerMCPClient
 import tool_def_maker
 
+# The agents import helpers from agent_core/ at the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 
 # ------------------------------------------------------------------
 # Read MCP config dynamically from neo4j_config.json
@@ -1,17 +1,37 @@
 # neo4j_runner.py
 
+import asyncio
 import os
+import sys
 import json
+import time
+from contextlib import asynccontextmanager
 from typing import Dict, Any, List
 
 from dotenv import load_dotenv
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.prompts import load_mcp_prompt
+from langchain_mcp_adapters.tools import load_mcp_tools
 import tool_def_maker
+# The agents import helpers from agent_core/ at the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import task_executor  # your existing module
+from agent_core.cassette import CASSETTE
+from agent_core.llm import emit
+from agent_core.tracing import span
 
 load_dotenv()
 
 MCP_CONFIG_PATH = "neo4j_config.json"
+MCP_SERVER_NAME = "neo4j"
+SCHEMA_PROMPT_NAME = "neo4j_schema"
+
+# Long-lived MCP sessions kept by api.py (each one is a `python server.py` process)
+MCP_POOL_SIZE = int(os.getenv("NEO4J_MCP_POOL_SIZE", "2"))
+MCP_PING_TIMEOUT = float(os.getenv("NEO4J_MCP_PING_TIMEOUT", "5"))
+# A pooled session re-reads the schema prompt when it is older than this (seconds)
+MCP_SCHEMA_TTL = float(os.getenv("NEO4J_MCP_SCHEMA_TTL", "300"))
+
 
 def load_mcp_config(config_path: str = MCP_CONFIG_PATH):
     with open(config_path, "r") as f:
@@ -19,56 +39,288 @@ def load_mcp_config(config_path: str = MCP_CONFIG_PATH):
     return cfg.get("mcpServers", {})
 
 
-async def run_neo4j_task(user_prompt: str) -> str:
+def _system_prompt(messages) -> dict:
+    """Convert the first MCP prompt message to a proper system message."""
+    first = messages[0]
+    content = getattr(first, "content", "") if not isinstance(first, dict) else first.get("content", "")
+    return {"role": "system", "content": content or "Schema prompt contained no content."}
+
+
+def _tool_setup(tools) -> tuple:
+    if not tools:
+        raise RuntimeError("No MCP tools discovered. Check your MCP server.")
+
+    tool_defs = [tool_def_maker.lc_tool_to_openai_def(t) for t in tools]
+    tool_mapping = tool_def_maker.build_tool_mapping(tools, tool_defs)
+    return tool_mapping, tool_defs
+
+
+class MCPSession:
     """
-    This is basically your `main()` from client.py,
-    but parameterized by a prompt coming from the UI.
+    One live MCP server process with its tools and schema prompt loaded once.
+
+    The session's context managers are entered and exited by a dedicated owner task:
+    the stdio transport runs in an anyio task group, which must be closed by the task
+    that opened it, and sessions here are (re)opened from whichever request finds them dead.
+    """
+
+    def __init__(self, client: MultiServerMCPClient, server_name: str = MCP_SERVER_NAME):
+        self.client = client
+        self.server_name = server_name
+        self.session = None
+        self.tool_mapping: dict = {}
+        self.tool_defs: list = []
+        self.systemPrompt: dict = {}
+        self.started_at = 0.0
+        self.schema_at = 0.0
+        self.uses = 0
+        self._owner = None
+        self._stop = None
+
+    async def start(self) -> None:
+        self._stop = asyncio.Event()
+        ready = asyncio.get_running_loop().create_future()
+        self._owner = asyncio.create_task(self._own(ready))
+        await ready
+
+    async def _own(self, ready: asyncio.Future) -> None:
+        try:
+            async with self.client.session(self.server_name) as session:
+                tools = await load_mcp_tools(session)
+                self.tool_mapping, self.tool_defs = _tool_setup(tools)
+                self.session = session
+                await self.refresh_schema()
+                self.started_at = time.monotonic()
+                ready.set_result(None)
+                await self._stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            elif not isinstance(e, asyncio.CancelledError):
+                print(f"MCP session ended: {e!r}")
+        finally:
+            self.session = None
+
+    async def refresh_schema(self) -> None:
+        self.systemPrompt = _system_prompt(await load_mcp_prompt(self.session, SCHEMA_PROMPT_NAME))
+        self.schema_at = time.monotonic()
+
+    async def healthy(self) -> bool:
+        """True if the server process is still answering pings."""
+        if self.session is None or self._owner is None or self._owner.done():
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), MCP_PING_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def close(self) -> None:
+        if self._owner is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._owner), MCP_PING_TIMEOUT)
+        except Exception:
+            # A wedged server doesn't get to hold up shutdown
+            self._owner.cancel()
+        self._owner = None
+
+
+class PooledTool:
     """
+    Stands in for one MCP tool of a pooled session. Each call checks a session out of the pool
+    for just that call, so a request holds no session while its LLM turns run.
+    """
+
+    def __init__(self, pool: "MCPSessionPool", name: str):
+        self.pool = pool
+        self.name = name
+
+    async def coroutine(self, **kwargs):
+        async with self.pool.session() as mcp:
+            return await mcp.tool_mapping[self.name].coroutine(**kwargs)
+
+
+class MCPSessionPool:
+    """
+    Application-scoped pool of MCPSessions, so a request doesn't pay for spawning the
+    server, listing tools, connecting to Neo4j and building the schema prompt.
+
+        pool = MCPSessionPool(load_mcp_config())
+        await pool.start()                      # FastAPI lifespan startup
+        tool_mapping, tool_defs, systemPrompt = await pool.setup()     # per request
+        await pool.close()                      # lifespan shutdown
+
+    Sessions are only checked out for the length of one MCP exchange (setup, or one
+    tool call), so NEO4J_MCP_POOL_SIZE bounds concurrent tool calls, not concurrent
+    requests. Each session is pinged when it is checked out; one that died (crashed server,
+    broken pipe) is replaced before it is used. The schema prompt is re-read over the live
+    session once it is older than NEO4J_MCP_SCHEMA_TTL.
+    """
+
+    def __init__(self, mcp_servers: dict, size: int = MCP_POOL_SIZE, server_name: str = MCP_SERVER_NAME):
+        self.client = MultiServerMCPClient(mcp_servers)
+        self.size = max(1, size)
+        self.server_name = server_name
+        self._sessions: list[MCPSession] = []
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self.checkouts = 0
+        self.recreated = 0
+        self.wait_seconds = 0.0
+
+    async def start(self) -> None:
+        self._sessions = [MCPSession(self.client, self.server_name) for _ in range(self.size)]
+        results = await asyncio.gather(*(s.start() for s in self._sessions), return_exceptions=True)
+        failed = [r for r in results if isinstance(r, BaseException)]
+        if failed:
+            # Keep serving: a session that didn't start is started again when a request checks it out
+            print(f"{len(failed)} of {self.size} MCP sessions failed to start: {failed[0]!r}")
+        for s in self._sessions:
+            self._idle.put_nowait(s)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(s.close() for s in self._sessions))
+        self._sessions = []
+
+    @asynccontextmanager
+    async def session(self):
+        with span("mcp checkout", "stage", pooled=True) as s:
+            start = time.perf_counter()
+            mcp = await self._idle.get()
+            waited = time.perf_counter() - start
+            self.wait_seconds += waited
+            self.checkouts += 1
+            s.set(queue_seconds=round(waited, 6))
+        try:
+            with span("mcp health check", "stage"):
+                if not await mcp.healthy():
+                    print("MCP session is not responding; starting a new one")
+                    await mcp.close()
+                    await mcp.start()
+                    self.recreated += 1
+                elif time.monotonic() - mcp.schema_at > MCP_SCHEMA_TTL:
+                    await mcp.refresh_schema()
+            mcp.uses += 1
+            yield mcp
+        finally:
+            self._idle.put_nowait(mcp)
+
+    async def setup(self) -> tuple:
+        """
+        Tools and schema prompt for one request: (tool_mapping, tool_defs, systemPrompt).
+        The mapping holds PooledTools, which borrow a session per call.
+        """
+        async with self.session() as mcp:
+            tool_defs, systemPrompt = mcp.tool_defs, mcp.systemPrompt
+        tool_mapping = {d["function"]["name"]: PooledTool(self, d["function"]["name"]) for d in tool_defs}
+        return tool_mapping, tool_defs, systemPrompt
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "checkouts": self.checkouts,
+            "recreated": self.recreated,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "sessions": [
+                {"alive": s.session is not None, "uses": s.uses,
+                 "age_sec": round(now - s.started_at, 1) if s.started_at else None}
+                for s in self._sessions
+            ],
+        }
+
+
+async def one_shot_setup(mcp_servers: dict | None = None) -> tuple:
+    """
+    The per-request setup without a pool: a fresh MultiServerMCPClient, tool list and schema prompt.
+    Its tools open a new server session for every call. Returns (tool_mapping, tool_defs, systemPrompt).
+    """
+
+    if CASSETTE.replaying:
+        # Offline: tools, schema prompt and every LLM / tool answer come from the cassette
+        tool_defs = CASSETTE.value("tool_defs")
+        return CASSETTE.replay_tool_mapping(tool_defs), tool_defs, CASSETTE.value("systemPrompt")
 
     # 1️⃣ Load MCP servers from config.json
-    mcp_servers = load_mcp_config()
+    mcp_servers = mcp_servers or load_mcp_config()
 
     # 2️⃣ Initialize MCP client
     client = MultiServerMCPClient(mcp_servers)
 
-    # 3️⃣ Ensure OpenAI key is available
-    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-    if not os.environ.get("OPENAI_API_KEY"):
-        raise ValueError("❌ OPENAI_API_KEY not found in .env file!")
-
-    # 4️⃣ Collect tools exposed by the MCP servers
+    # 3️⃣ Collect tools exposed by the MCP servers
     tools = await client.get_tools()
 
-    # 5️⃣ Collect prompts exposed by the MCP servers (schema as system prompt)
+    # 4️⃣ Collect prompts exposed by the MCP servers (schema as system prompt)
     systemPromptMessage = await client.get_prompt(
-        server_name="neo4j",
-        prompt_name="neo4j_schema"
+        server_name=MCP_SERVER_NAME,
+        prompt_name=SCHEMA_PROMPT_NAME
     )
 
-    # convert first MCP prompt message to a proper system message
-    first = systemPromptMessage[0]
-    content = getattr(first, "content", "") if not isinstance(first, dict) else first.get("content", "")
-    systemPrompt = {"role": "system", "content": content or "Schema prompt contained no content."}
+    tool_mapping, tool_defs = _tool_setup(tools)
+    systemPrompt = _system_prompt(systemPromptMessage)
+    if CASSETTE.recording:
+        CASSETTE.record_value("tool_defs", tool_defs)
+        CASSETTE.record_value("systemPrompt", systemPrompt)
+    return tool_mapping, tool_defs, systemPrompt
 
-    if not tools:
-        raise RuntimeError("No MCP tools discovered. Check your MCP server.")
 
-    tool_defs = [tool_def_maker.lc_tool_to_openai_def(t) for t in tools]
-    tool_mapping = tool_def_maker.build_tool_mapping(tools, tool_defs)
+async def run_neo4j_task(user_prompt: str, on_token=None, on_event=None, pool: MCPSessionPool | None = None) -> str:
+    """
+    This is basically your `main()` from client.py,
+    but parameterized by a prompt coming from the UI.
+
+    `on_token` / `on_event` are passed to the agent loops (see agent_core/engine.py) so a
+    caller can stream progress; on_event also gets a "stage" event as each executor starts.
+
+    With a `pool` the tools and schema prompt come from it, and each tool call borrows a
+    pooled session only while it runs; without one they are set up from scratch for this call. Recording or replaying a cassette (AGENT_CASSETTE)
+    always takes the from-scratch path, so the cassette holds the tool list and schema prompt.
+    """
+
+    # Ensure OpenAI key is available
+    if not CASSETTE.replaying:
+        os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+        if not os.environ.get("OPENAI_API_KEY"):
+            raise ValueError("❌ OPENAI_API_KEY not found in .env file!")
+
+    if pool is None or CASSETTE.mode:
+        with span("mcp setup", "stage", pooled=False):
+            tool_mapping, tool_defs, systemPrompt = await one_shot_setup()
+        return await _run_executors(user_prompt, tool_mapping, tool_defs, systemPrompt, on_token, on_event)
+
+    tool_mapping, tool_defs, systemPrompt = await pool.setup()
+    return await _run_executors(user_prompt, tool_mapping, tool_defs, systemPrompt, on_token, on_event)
+
+
+async def _run_executors(user_prompt: str, tool_mapping: dict, tool_defs: list, systemPrompt: dict,
+                         on_token=None, on_event=None) -> str:
+    async def stage(name: str) -> None:
+        if on_event is not None:
+            await emit(on_event, "stage", {"name": name})
 
     # 🔥 Instead of importing promptx, we use `user_prompt` from UI
-    res = await task_executor.task_executor_openai(
-        strategy=user_prompt,
-        tool_mapping=tool_mapping,
-        tool_defs=tool_defs,
-        systemPrompt=systemPrompt,
-    )
+    await stage("query")
+    with span("query", "stage"):
+        res = await task_executor.task_executor_openai(
+            strategy=user_prompt,
+            tool_mapping=tool_mapping,
+            tool_defs=tool_defs,
+            systemPrompt=systemPrompt,
+            on_token=on_token,
+            on_event=on_event,
+        )
 
-    res2 = await task_executor.task_executor_openai2(
-        query=res,
-        tool_mapping=tool_mapping,
-        tool_defs=tool_defs,
-        systemPrompt=systemPrompt,
-    )
+    await stage("answer")
+    with span("answer", "stage"):
+        res2 = await task_executor.task_executor_openai2(
+            query=res,
+            tool_mapping=tool_mapping,
+            tool_defs=tool_defs,
+            systemPrompt=systemPrompt,
+            on_token=on_token,
+            on_event=on_event,
+        )
 
     return res + "\n " + res2
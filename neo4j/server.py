@@ -1,4 +1,6 @@
 import os
+import threading
+import time
 from typing import List, Dict, Any
 
 from neo4j import GraphDatabase
@@ -359,82 +361,88 @@ def list_relationship_types() -> List[str]:
 
 
 
-def build_schema_text() -> str:
+# -------------------------------------------------
+# Schema snapshot cache
+# -------------------------------------------------
+
+# apoc.meta.data() scans the whole graph, so the schema text is cached. Within the TTL it is
+# served as-is; after that a cheap fingerprint (label / relationship-type / property-key
+# counts) decides whether the graph changed and the snapshot must be rebuilt.
+SCHEMA_TTL = float(os.getenv("NEO4J_SCHEMA_TTL", "300"))
+SCHEMA_FILE = "schema.txt"
+
+FINGERPRINT_QUERY = """
+CALL db.labels() YIELD label
+WITH count(label) AS labels
+CALL db.relationshipTypes() YIELD relationshipType
+WITH labels, count(relationshipType) AS relationship_types
+CALL db.propertyKeys() YIELD propertyKey
+RETURN labels, relationship_types, count(propertyKey) AS property_keys
+"""
+
+META_QUERY = """
+CALL apoc.meta.data()
+YIELD label, other, elementType, type, property
+RETURN label, other, elementType, type, property
+"""
+
+_schema_lock = threading.Lock()
+_schema = {
+    "text": None,
+    "fingerprint": None,
+    "checked_at": 0.0,
+    "builds": 0,
+    "fingerprint_checks": 0,
+}
+
+
+def _schema_fingerprint(session) -> tuple:
+    record = session.run(FINGERPRINT_QUERY).single()
+    return record["labels"], record["relationship_types"], record["property_keys"]
+
+
+def _read_schema(session) -> str:
     """
-    Extract a readable schema snapshot from Neo4j.
-    Tries APOC meta; falls back to db.labels(), db.relationshipTypes(), db.propertyKeys().
-    Returns a string ready to be used as a system prompt.
+    Build the schema text from one apoc.meta.data() pass.
+    Falls back to db.labels(), db.relationshipTypes(), db.propertyKeys() without APOC.
     """
-    driver = _get_driver()
+    try:
+        # ---------- Try APOC ----------
+        node_properties: Dict[str, List[str]] = {}    # label -> properties
+        edge_properties: Dict[str, List[str]] = {}    # rel-type -> properties
+        relationships_text = ""
 
-    node_properties_text = ""
-    edge_properties_text = ""
-    relationships_text = ""
+        for record in session.run(META_QUERY):
+            label, element_type, kind, prop = record["label"], record["elementType"], record["type"], record["property"]
 
-    with driver.session() as session:
-        try:
-            # ---------- Try APOC ----------
-            # Node properties per label
-            node_query = """
-            CALL apoc.meta.data()
-            YIELD label, other, elementType, type, property
-            WHERE elementType = 'node' AND type <> 'RELATIONSHIP'
-            WITH label AS nodeLabel, collect(DISTINCT property) AS properties
-            RETURN {labels: nodeLabel, properties: properties} AS output
-            """
+            # Relationship mappings (source → target) per rel-type
+            if kind == "RELATIONSHIP":
+                relationships_text += f"(:`{label}`) - [:`{prop}`] -> (:`{record['other']}`)\n"
 
+            # Node properties per label
+            if element_type == "node" and kind != "RELATIONSHIP":
+                props = node_properties.setdefault(label, [])
             # Relationship properties per rel-type
-            rel_query = """
-            CALL apoc.meta.data()
-            YIELD label, other, elementType, type, property
-            WHERE elementType = 'relationship'
-            WITH label AS relType, collect(DISTINCT property) AS properties
-            RETURN {type: relType, properties: properties} AS output
-            """
-
-            # Relationship mappings (source → target) per rel-type
-            rel_map_query = """
-            CALL apoc.meta.data()
-            YIELD label, other, elementType, type, property
-            WHERE type = 'RELATIONSHIP'
-            RETURN {source: label, relationship: property, target: other} AS output
-            """
-
-            node_labels_res = session.run(node_query)
-            rel_types_res = session.run(rel_query)
-            rel_maps_res = session.run(rel_map_query)
-
-            for record in node_labels_res:
-                out = record["output"]
-                node_properties_text += f"- (:`{out['labels']}`): {out['properties']}\n"
-
-            for record in rel_types_res:
-                out = record["output"]
-                edge_properties_text += f"- [:`{out['type']}`]: {out['properties']}\n"
-
-            for record in rel_maps_res:
-                out = record["output"]
-                source = out.get("source", "?")
-                rel_name = out.get("relationship", "?")
-                target = out.get("target", "?")
-                relationships_text += f"(:`{source}`) - [:`{rel_name}`] -> (:`{target}`)\n"
-
-            if not node_properties_text:
-                node_properties_text = "No node labels found"
-            if not edge_properties_text:
-                edge_properties_text = "No relationship types found"
-            if not relationships_text:
-                relationships_text = "No relationship mappings found"
-
-        except Exception:
-            # ---------- Fallback (no APOC) ----------
-            labels = [r[0] for r in session.run("CALL db.labels()")]
-            rels   = [r[0] for r in session.run("CALL db.relationshipTypes()")]
-            props  = [r[0] for r in session.run("CALL db.propertyKeys()")]
-
-            node_properties_text = "\n".join(f"- (:`{l}`)" for l in labels) or "No nodes found"
-            edge_properties_text = "\n".join(f"- [:`{r}`]" for r in rels)   or "No relationships found"
-            relationships_text   = "APOC not installed; relationship map unavailable."
+            elif element_type == "relationship":
+                props = edge_properties.setdefault(label, [])
+            else:
+                continue
+            if prop not in props:
+                props.append(prop)
+
+        node_properties_text = "".join(f"- (:`{l}`): {p}\n" for l, p in node_properties.items()) or "No node labels found"
+        edge_properties_text = "".join(f"- [:`{t}`]: {p}\n" for t, p in edge_properties.items()) or "No relationship types found"
+        relationships_text = relationships_text or "No relationship mappings found"
+
+    except Exception:
+        # ---------- Fallback (no APOC) ----------
+        labels = [r[0] for r in session.run("CALL db.labels()")]
+        rels   = [r[0] for r in session.run("CALL db.relationshipTypes()")]
+        props  = [r[0] for r in session.run("CALL db.propertyKeys()")]
+
+        node_properties_text = "\n".join(f"- (:`{l}`)" for l in labels) or "No nodes found"
+        edge_properties_text = "\n".join(f"- [:`{r}`]" for r in rels)   or "No relationships found"
+        relationships_text   = "APOC not installed; relationship map unavailable."
 
     schema = f"""
 This is the schema representation of the Neo4j database.
@@ -454,6 +462,47 @@ Please respect relationship types and directions when creating or querying the g
     return schema
 
 
+def _write_schema_file(text: str) -> None:
+    """Write schema.txt only when its contents would change."""
+    try:
+        with open(SCHEMA_FILE) as f:
+            if f.read() == text:
+                return
+    except FileNotFoundError:
+        pass
+
+    with open(SCHEMA_FILE, "w") as f:
+        f.write(text)
+
+
+def build_schema_text(force: bool = False) -> str:
+    """
+    Return a readable schema snapshot of Neo4j, ready to be used as a system prompt.
+    Served from memory for NEO4J_SCHEMA_TTL seconds, then rebuilt only if the
+    label / relationship-type / property-key counts changed. `force` always rebuilds.
+    """
+    with _schema_lock:
+        now = time.monotonic()
+        if not force and _schema["text"] is not None and now - _schema["checked_at"] < SCHEMA_TTL:
+            return _schema["text"]
+
+        driver = _get_driver()
+        with driver.session() as session:
+            _schema["fingerprint_checks"] += 1
+            fingerprint = _schema_fingerprint(session)
+
+            if force or _schema["text"] is None or fingerprint != _schema["fingerprint"]:
+                text = _read_schema(session)
+                _schema["builds"] += 1
+                if text != _schema["text"]:
+                    _write_schema_file(text)
+                _schema["text"] = text
+                _schema["fingerprint"] = fingerprint
+
+        _schema["checked_at"] = now
+        return _schema["text"]
+
+
 # --- register an MCP prompt that returns a *system* message ---
 
 @mcp.prompt(name="neo4j_schema", description="Returns a system message containing the current Neo4j schema snapshot.")
@@ -465,9 +514,6 @@ def neo4j_schema_prompt() -> list[dict]:
     text = build_schema_text()
     # return [{"role": "system", "content": text}]
 
-    with open('schema.txt', 'w') as f:
-        f.write(text)
-
     # FastMCP prompts can only return 'user' or 'assistant'
     return [{"role": "assistant", "content": text}]
 
@@ -1,12 +1,13 @@
-import aisuite as ai
-CLIENT = ai.Client()
-
-import json
+from agent_core.engine import AgentLoop
+from agent_core.llm import chat
 
 # ollama:gemma3:latest
 
+# run_cypher is the only tool that writes; its calls in one turn run in order, one at a time
+SERIAL_TOOLS = {"run_cypher"}
+
 
-def planner_ollama(query, tool_defs, model: str = "ollama:gemma3:latest") -> str:
+async def planner_ollama(query, tool_defs, model: str = "ollama:gemma3:latest") -> str:
     """
     Use a local Ollama model as a planner.
     It will *not* actually call tools, it only reasons about them in text.
@@ -46,7 +47,7 @@ def planner_ollama(query, tool_defs, model: str = "ollama:gemma3:latest") -> str
     - Do NOT add extra commentary; just the steps.
     """
 
-    response = CLIENT.chat.completions.create(
+    response = await chat(
         model=model,
         messages=[
             {"role": "system", "content": "You are a task planner."},
@@ -59,7 +60,8 @@ def planner_ollama(query, tool_defs, model: str = "ollama:gemma3:latest") -> str
     return response.choices[0].message.content
     
 
-async def task_executor_openai(strategy,tool_mapping, tool_defs, systemPrompt: dict ={"role": "system", "content":""}, model: str = "openai:gpt-4o-mini") -> str: 
+async def task_executor_openai(strategy,tool_mapping, tool_defs, systemPrompt: dict ={"role": "system", "content":""}, model: str = "openai:gpt-4o-mini",
+                               on_token=None, on_event=None) -> str: 
 
     ### START CODE HERE ###
 
@@ -241,99 +243,16 @@ Nothing more. Nothing less.
                 {"role": "user", "content": plannerPrompt + prompt}
                 ]
 
-    for i in range(max_turns):
-
-        print(f"\n**********************************************************************************\n")
-
-        print(f"Attempt : {i+1}")
-    
-        # Get a response from the LLM by creating a chat with the client.
-        response = CLIENT.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools = tool_defs,
-            temperature=1.0,
-        )
-
-        msg = response.choices[0].message
-
-        assistant_msg = {
-            "role": msg.role,
-            "content": msg.content or ""
-        }
-
-        # IMPORTANT: keep tool_calls if present
-        if getattr(msg, "tool_calls", None):
-            assistant_msg["tool_calls"] = [
-                {
-                    "id": tc.id,
-                    "type": tc.type,
-                    "function": {
-                        "name": tc.function.name,
-                        "arguments": tc.function.arguments,
-                    },
-                }
-                for tc in msg.tool_calls
-            ]
-
-        messages.append(assistant_msg)
-
-
-
-        if not msg.tool_calls:      
-            final_text = msg.content
-            print("✅ Final answer:")
-            print(final_text)
-            break
-
-        else:
-            print("Tool Calls Detected:")
-            print(msg.tool_calls)
-
-
-        for tool_call in msg.tool_calls:
-
-            tool_id = tool_call.id
-            tool_name = tool_call.function.name
-            tool_args = tool_call.function.arguments
-
-            args = json.loads(tool_args or "{}")  
-
-
-            print(f'Calling tool: {tool_name} with args: {tool_args}')
-
-            # tool_response = tool_mapping[tool_name](**args)
-
-            tool = tool_mapping[tool_name]
-
-            # 🔄 ASYNC EXECUTION
-            # if hasattr(tool, "ainvoke"):
-            #     tool_response = await tool.ainvoke(args)
-            # else:
-            #     tool_response = tool.invoke(args)
-
-            tool_response = await tool.coroutine(**args)
-
-            print(f'Tool response: {tool_response}')
-
-            messages.append(
-                {
-                    "role": "tool",
-                    "tool_call_id": tool_id,
-                    "tool_name": tool_name,         
-                    "content": str(tool_response)    
-                }
-            )
-
-
+    agent = AgentLoop(model, tool_mapping, tool_defs, max_turns=max_turns, on_token=on_token, on_event=on_event,
+                      cache=False, serial_tools=SERIAL_TOOLS)
+    return await agent.run(messages, temperature=1.0)
 
-    return final_text
 
 
 
 
-
-async def task_executor_openai2(query,tool_mapping, tool_defs, systemPrompt: dict ={"role": "system", "content":""}, model: str = "openai:gpt-4o-mini") -> str: 
+async def task_executor_openai2(query,tool_mapping, tool_defs, systemPrompt: dict ={"role": "system", "content":""}, model: str = "openai:gpt-4o-mini",
+                                on_token=None, on_event=None) -> str: 
 
     ### START CODE HERE ###
 
@@ -402,90 +321,6 @@ async def task_executor_openai2(query,tool_mapping, tool_defs, systemPrompt: dic
                 {"role": "user", "content": prompt}
                 ]
 
-    for i in range(max_turns):
-
-        print(f"\n**********************************************************************************\n")
-
-        print(f"Attempt : {i+1}")
-    
-        # Get a response from the LLM by creating a chat with the client.
-        response = CLIENT.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools = tool_defs,
-            temperature=1.0,
-        )
-
-        msg = response.choices[0].message
-
-        assistant_msg = {
-            "role": msg.role,
-            "content": msg.content or ""
-        }
-
-        # IMPORTANT: keep tool_calls if present
-        if getattr(msg, "tool_calls", None):
-            assistant_msg["tool_calls"] = [
-                {
-                    "id": tc.id,
-                    "type": tc.type,
-                    "function": {
-                        "name": tc.function.name,
-                        "arguments": tc.function.arguments,
-                    },
-                }
-                for tc in msg.tool_calls
-            ]
-
-        messages.append(assistant_msg)
-
-
-
-        if not msg.tool_calls:      
-            final_text = msg.content
-            print("✅ Final answer:")
-            print(final_text)
-            break
-
-        else:
-            print("Tool Calls Detected:")
-            print(msg.tool_calls)
-
-
-        for tool_call in msg.tool_calls:
-
-            tool_id = tool_call.id
-            tool_name = tool_call.function.name
-            tool_args = tool_call.function.arguments
-
-            args = json.loads(tool_args or "{}")  
-
-
-            print(f'Calling tool: {tool_name} with args: {tool_args}')
-
-            # tool_response = tool_mapping[tool_name](**args)
-
-            tool = tool_mapping[tool_name]
-
-            # 🔄 ASYNC EXECUTION
-            # if hasattr(tool, "ainvoke"):
-            #     tool_response = await tool.ainvoke(args)
-            # else:
-            #     tool_response = tool.invoke(args)
-
-            tool_response = await tool.coroutine(**args)
-
-            print(f'Tool response: {tool_response}')
-
-            messages.append(
-                {
-                    "role": "tool",
-                    "tool_call_id": tool_id,
-                    "tool_name": tool_name,         
-                    "content": str(tool_response)    
-                }
-            )
-
-
-
-    return final_text
+    agent = AgentLoop(model, tool_mapping, tool_defs, max_turns=max_turns, on_token=on_token, on_event=on_event,
+                      cache=False, serial_tools=SERIAL_TOOLS)
+    return await agent.run(messages, temperature=1.0)